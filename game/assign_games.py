@@ -1,9 +1,34 @@
 import sys
+import argparse
 import random
 import math
 import heapq
+import time
+import uuid
+import json
+from collections import OrderedDict, deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Tuple
 
+try:
+    import numpy as np
+except ImportError:  # numpy 可选，仅用于批量评估
+    np = None
+
+# 候选数达到此值才使用 numpy 批量评估，否则逐个模拟更快（实测 4×10 到 10×50 的实例在 256 个左右持平，
+# 1024 个时约快一倍）
+BATCH_MIN_CANDIDATES = 256
+# 每条链初始解的随机候选数；设为 BATCH_MIN_CANDIDATES 及以上时整个种群用 numpy 一次评估
+POPULATION = 5
+
+# 退火的邻域操作：swap 交换一人的两个位置，insert 把一个任务挪到另一位置，reverse 翻转一段，
+# cross 让两人对调同一序号上的光碟
+MOVES = ("swap", "insert", "reverse", "cross")
+# 自适应选择：各操作的权重为近期改进率的指数滑动平均，被选中的概率至少为 MOVE_MIN_PROB
+MOVE_ADAPT_RATE = 0.05
+MOVE_MIN_PROB = 0.05
+
 # ---------- 核心算法（与之前相同）----------
 
 def simulate(orders: List[List[int]], durations: List[float]) -> float:
@@ -26,6 +51,8 @@ def simulate(orders: List[List[int]], durations: List[float]) -> float:
             else:
                 wait_queues[j].append(i)
 
+    # avail[j] 为光碟 j 被占用到的时刻，归还后置为 -1。同一时刻结束的事件依次出队，
+    # 占用者的结束事件尚未处理时 avail[j] == t，此时必须排队而不能直接开始，否则会重复占用
     max_time = 0.0
     while events:
         t, i, j = heapq.heappop(events)
@@ -39,11 +66,11 @@ def simulate(orders: List[List[int]], durations: List[float]) -> float:
             heapq.heappush(events, (end, next_i, j))
             cur[next_i] += 1
         else:
-            avail[j] = t
+            avail[j] = -1.0
 
         if cur[i] < M:
             next_j = orders[i][cur[i]]
-            if avail[next_j] <= t:
+            if avail[next_j] < t:
                 start = t
                 end = start + durations[next_j]
                 avail[next_j] = end
@@ -54,11 +81,407 @@ def simulate(orders: List[List[int]], durations: List[float]) -> float:
 
     return max_time
 
-def random_solution(N: int, M: int) -> List[List[int]]:
+def simulate_batch(batch, durations: List[float]):
+    """批量评估 K 个候选方案（形如 (K, N, M) 的整数数组），返回 K 个总完成时间
+
+    与 simulate() 结果完全一致：每个人同一时刻最多只有一个事件，堆按 (结束时间, 人) 出队
+    等价于在 N 个人中取结束时间最小、编号最小者；等待队列用入队序号实现先进先出。
+    所有候选都恰好弹出 N*M 个事件，因此可以在 K 维上同步推进。
+    候选数较少或未安装 numpy 时逐个调用 simulate()。
+    """
+    if np is None or len(batch) < BATCH_MIN_CANDIDATES:
+        return [simulate(orders, durations) for orders in batch]
+
+    orders = np.asarray(batch, dtype=np.intp)
+    K, N, M = orders.shape
+    dur = np.asarray(durations, dtype=np.float64)
+    rows = np.arange(K)
+
+    cur = np.zeros((K, N), dtype=np.intp)
+    end = np.full((K, N), np.inf)           # 每人当前事件的结束时间，无事件为 inf
+    task = np.zeros((K, N), dtype=np.intp)   # 每人当前事件对应的任务
+    waiting_for = np.full((K, N), -1, dtype=np.intp)
+    wait_seq = np.zeros((K, N), dtype=np.int64)
+    avail = np.zeros((K, M))
+    max_time = np.zeros(K)
+    no_wait = np.iinfo(np.int64).max
+
+    for i in range(N):
+        j = orders[:, i, 0]
+        free = avail[rows, j] <= 0
+        k = rows[free]
+        end[k, i] = dur[j[free]]
+        task[k, i] = j[free]
+        avail[k, j[free]] = dur[j[free]]
+        cur[k, i] = 1
+        k = rows[~free]
+        waiting_for[k, i] = j[~free]
+        wait_seq[k, i] = i - N
+
+    for step in range(N * M):
+        i = end.argmin(axis=1)
+        t = end[rows, i]
+        j = task[rows, i]
+        np.maximum(max_time, t, out=max_time)
+
+        # 释放光碟：交给等待最久的人（没有人等待时 next_i 的写入保持原值）
+        queued = waiting_for == j[:, None]
+        has_next = queued.any(axis=1)
+        next_i = np.where(queued, wait_seq, no_wait).argmin(axis=1)
+        new_end = t + dur[j]
+        end[rows, next_i] = np.where(has_next, new_end, end[rows, next_i])
+        task[rows, next_i] = np.where(has_next, j, task[rows, next_i])
+        waiting_for[rows, next_i] = np.where(has_next, -1, waiting_for[rows, next_i])
+        cur[rows, next_i] += has_next
+        avail[rows, j] = np.where(has_next, new_end, -1.0)
+
+        # 此人继续下一个任务，光碟被占用则排队
+        ci = cur[rows, i]
+        more = ci < M
+        next_j = orders[rows, i, np.minimum(ci, M - 1)]
+        free = more & (avail[rows, next_j] < t)
+        new_end = t + dur[next_j]
+        end[rows, i] = np.where(free, new_end, np.inf)
+        task[rows, i] = np.where(free, next_j, task[rows, i])
+        avail[rows, next_j] = np.where(free, new_end, avail[rows, next_j])
+        cur[rows, i] += free
+        wait = more & ~free
+        waiting_for[rows, i] = np.where(wait, next_j, -1)
+        wait_seq[rows, i] = np.where(wait, step, wait_seq[rows, i])
+
+    return max_time
+
+def pack_orders(orders: List[List[int]]) -> array:
+    """把 N 个人的顺序压成一维 array('H')，第 i 个人的第 k 个任务位于 i*M + k"""
+    flat = array('H')
+    for order in orders:
+        flat.extend(order)
+    return flat
+
+def unpack_orders(flat: array, N: int) -> List[List[int]]:
+    M = len(flat) // N if N else 0
+    return [flat[i * M:(i + 1) * M].tolist() for i in range(N)]
+
+class CostCache:
+    """已评估方案的总完成时间缓存，超过 maxsize 时按最近最少使用淘汰
+
+    键为一维顺序数组的字节串（精确比较，不会因哈希冲突返回错误结果）。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # 多链并行时条目留在各进程的缓存中，这里记其总数（见 multi_start_annealing）
+        self.worker_size = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: bytes):
+        cost = self._data.get(key)
+        if cost is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return cost
+
+    def put(self, key: bytes, cost: float):
+        self._data[key] = cost
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data) + self.worker_size}
+
+class SolverStats:
+    """求解过程统计：计数、分阶段耗时和收敛轨迹
+
+    trace 为 (迭代次数, 温度, 当前解, 最优解) 列表，每 trace_every 次迭代记录一次（0 表示不记录）；
+    callback(stats, iteration, temp, current_cost, best_cost) 在每个记录点被调用。
+    best_history 为最优解每次改进时的 (已模拟次数, 最优解) 列表，moves 为各邻域操作的 [使用次数, 改进次数]。
+    """
+
+    def __init__(self, trace_every: int = 1, callback=None):
+        self.trace_every = trace_every
+        self.callback = callback
+        self.iterations = 0
+        self.accepted = 0
+        self.improvements = 0
+        self.simulations = 0
+        self.init_time = 0.0
+        self.anneal_time = 0.0
+        self.eval_time = 0.0
+        self.best_iteration = 0
+        self.best_time = 0.0
+        self.final_temp = None
+        self.trace = []
+        self.best_history = []
+        self.moves = {}
+        self._start = time.perf_counter()
+
+    @property
+    def rejected(self) -> int:
+        return self.iterations - self.accepted
+
+    def record(self, iteration: int, temp: float, current_cost: float, best_cost: float):
+        self.trace.append((iteration, temp, current_cost, best_cost))
+        if self.callback is not None:
+            self.callback(self, iteration, temp, current_cost, best_cost)
+
+    def record_best(self, iteration: int, evaluations: int, best_cost: float):
+        self.improvements += 1
+        self.note_best(iteration, evaluations, best_cost)
+
+    def note_best(self, iteration: int, evaluations: int, best_cost: float):
+        self.best_iteration = iteration
+        self.best_time = time.perf_counter() - self._start
+        self.best_history.append((evaluations, best_cost))
+
+    def evaluations_to(self, target: float):
+        """最优解首次不超过 target 时已模拟的次数，始终未达到时返回 None"""
+        for evaluations, cost in self.best_history:
+            if cost <= target:
+                return evaluations
+        return None
+
+    def add_moves(self, moves, used: List[int], improved: List[int]):
+        for move, u, k in zip(moves, used, improved):
+            counts = self.moves.setdefault(move, [0, 0])
+            counts[0] += u
+            counts[1] += k
+
+    def add_run(self, iterations: int, accepted: int, simulations: int, eval_time: float,
+                anneal_time: float, temp: float):
+        self.iterations += iterations
+        self.accepted += accepted
+        self.simulations += simulations
+        self.eval_time += eval_time
+        self.anneal_time += anneal_time
+        self.final_temp = temp
+
+    def merge(self, other: Dict[str, Any]):
+        """累加另一个进程中链的统计（as_dict() 的结果），轨迹不合并"""
+        for key in ("iterations", "accepted", "improvements", "simulations",
+                    "init_time", "anneal_time", "eval_time"):
+            setattr(self, key, getattr(self, key) + other[key])
+        self.final_temp = other["final_temp"]
+        moves = other["moves"]
+        self.add_moves(moves, [moves[m][0] for m in moves], [moves[m][1] for m in moves])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "iterations": self.iterations,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "improvements": self.improvements,
+            "simulations": self.simulations,
+            "init_time": self.init_time,
+            "anneal_time": self.anneal_time,
+            "eval_time": self.eval_time,
+            "best_iteration": self.best_iteration,
+            "best_time": self.best_time,
+            "final_temp": self.final_temp,
+            "moves": {move: list(counts) for move, counts in self.moves.items()},
+        }
+
+    def summary(self) -> str:
+        per_sim = self.eval_time / self.simulations * 1000 if self.simulations else 0.0
+        rate = self.accepted / self.iterations * 100 if self.iterations else 0.0
+        lines = [
+            f"迭代 {self.iterations} 次：接受 {self.accepted}（{rate:.1f}%），"
+            f"拒绝 {self.rejected}，改进最优 {self.improvements} 次",
+            f"模拟 {self.simulations} 次，评估共 {self.eval_time:.3f} s，平均每次 {per_sim:.3f} ms",
+            f"初始化 {self.init_time:.3f} s，退火 {self.anneal_time:.3f} s",
+            f"最优解出现在第 {self.best_iteration} 次迭代（{self.best_time:.3f} s）",
+        ]
+        if self.final_temp is not None:
+            lines.append(f"最终温度 {self.final_temp:.6g}")
+        if self.moves:
+            lines.append("邻域操作（使用/改进）: " + "，".join(
+                f"{move} {used}/{improved}" for move, (used, improved) in self.moves.items()))
+        return "\n".join(lines)
+
+class IncrementalSimulator:
+    """增量评估器：模拟时按间隔保存事件状态检查点。
+
+    交换某人两个位置后，找到此人尚未读取到较前位置的最后一个检查点，只从那里重新模拟，
+    结果与 simulate() 完全一致。用法：cost = sim.propose_swap(...)，随后 commit() 接受或 revert() 撤销。
+    orders 为 pack_orders() 得到的一维数组，交换和撤销都原地进行。
+    start 为可选的初始状态 (cur, events, avail)，用于从中途继续模拟（见 replan()）。
+    """
+
+    def __init__(self, orders: array, N: int, durations: List[float],
+                 checkpoint_every: int = None, cache: "CostCache" = None, start=None):
+        self.orders = orders
+        self.start = start
+        self.durations = durations
+        self.N = N
+        self.M = len(durations)
+        # 检查点间隔（弹出事件数）：太密则复制状态开销大，太疏则重放的事件多
+        self.checkpoint_every = checkpoint_every or max(1, 2 * self.N)
+        self.checkpoints = []
+        self._pending = None
+        self.cache = cache
+        self.simulations = 1  # 实际模拟次数（不含缓存命中）
+        self.cost = self._run(self._initial_state(), self.checkpoints)
+        if cache is not None:
+            cache.put(orders.tobytes(), self.cost)
+
+    def _initial_state(self):
+        orders, durations = self.orders, self.durations
+        wait_queues = [[] for _ in range(self.M)]
+        if self.start is None:
+            cur = [0] * self.N
+            avail = [0.0] * self.M
+            events = []
+            busy = ()
+        else:
+            cur, events, avail = self.start
+            cur, events, avail = list(cur), list(events), list(avail)
+            heapq.heapify(events)
+            busy = {i for _, i, _ in events}
+        for i in range(self.N):
+            if i not in busy and cur[i] < self.M:
+                j = orders[i * self.M + cur[i]]
+                if avail[j] <= 0:
+                    end = durations[j]
+                    avail[j] = end
+                    heapq.heappush(events, (end, i, j))
+                    cur[i] += 1
+                else:
+                    wait_queues[j].append(i)
+        return 0.0, cur, avail, wait_queues, events
+
+    def _run(self, state, checkpoints) -> float:
+        """从给定状态继续模拟（与 simulate() 主循环相同），沿途保存检查点"""
+        orders, durations, M = self.orders, self.durations, self.M
+        every = self.checkpoint_every
+        max_time, cur, avail, wait_queues, events = state
+        countdown = 0
+
+        while events:
+            if countdown == 0:
+                checkpoints.append((max_time, tuple(cur), tuple(avail),
+                                    tuple(map(tuple, wait_queues)), tuple(events)))
+                countdown = every
+            countdown -= 1
+
+            t, i, j = heapq.heappop(events)
+            max_time = max(max_time, t)
+
+            if wait_queues[j]:
+                next_i = wait_queues[j].pop(0)
+                end = t + durations[j]
+                avail[j] = end
+                heapq.heappush(events, (end, next_i, j))
+                cur[next_i] += 1
+            else:
+                avail[j] = -1.0
+
+            if cur[i] < M:
+                next_j = orders[i * M + cur[i]]
+                if avail[next_j] < t:
+                    end = t + durations[next_j]
+                    avail[next_j] = end
+                    heapq.heappush(events, (end, i, next_j))
+                    cur[i] += 1
+                else:
+                    wait_queues[next_j].append(i)
+
+        return max_time
+
+    def _resume_point(self, person: int, pos: int) -> int:
+        """返回最后一个尚未读取 orders[person][pos] 的检查点下标，没有则返回 -1
+
+        cur[person] < pos 时此人最多刚读到 pos-1，检查点中的 cur 单调不减，可二分查找。
+        """
+        checkpoints = self.checkpoints
+        lo, hi = 0, len(checkpoints)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if checkpoints[mid][1][person] < pos:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def _resimulate(self, edits):
+        """从最后一个不受所有改动影响的检查点重新模拟，返回 (保留的检查点数, 新检查点, 总完成时间)"""
+        keep = min(self._resume_point(person, pos) for person, pos, _ in edits)
+        if keep < 0:
+            keep = 0
+            state = self._initial_state()
+        else:
+            max_time, cur, avail, wait_queues, events = self.checkpoints[keep]
+            state = (max_time, list(cur), list(avail),
+                     list(map(list, wait_queues)), list(events))
+
+        new_checkpoints = []
+        cost = self._run(state, new_checkpoints)
+        self.simulations += 1
+        return keep, new_checkpoints, cost
+
+    def propose_move(self, edits) -> float:
+        """按 edits 修改方案并返回新方案的总完成时间
+
+        edits 为 [(person, pos, values), ...]，依次把 orders[person] 从 pos 起的一段替换为 values，
+        由调用方保证改完后每人仍是光碟的一个排列。设置了 cache 时先查缓存，命中则不模拟；
+        若之后被接受，commit() 再补做模拟以重建检查点。
+        """
+        order, M = self.orders, self.M
+        undo = []
+        for person, pos, values in edits:
+            a = person * M + pos
+            undo.append((a, order[a:a + len(values)]))
+            order[a:a + len(values)] = array('H', values)
+
+        if self.cache is not None:
+            key = order.tobytes()
+            cost = self.cache.get(key)
+            if cost is not None:
+                self._pending = (edits, undo, None, None, cost)
+                return cost
+
+        keep, new_checkpoints, cost = self._resimulate(edits)
+        if self.cache is not None:
+            self.cache.put(key, cost)
+        self._pending = (edits, undo, keep, new_checkpoints, cost)
+        return cost
+
+    def propose_swap(self, person: int, pos1: int, pos2: int) -> float:
+        """交换 orders[person] 的两个位置并返回新方案的总完成时间"""
+        order, base = self.orders, person * self.M
+        return self.propose_move([(person, pos1, (order[base + pos2],)),
+                                  (person, pos2, (order[base + pos1],))])
+
+    def commit(self):
+        """接受上一次 propose_move / propose_swap 的结果"""
+        edits, _, keep, new_checkpoints, cost = self._pending
+        if new_checkpoints is None:
+            keep, new_checkpoints, cost = self._resimulate(edits)
+        del self.checkpoints[keep:]
+        self.checkpoints.extend(new_checkpoints)
+        self.cost = cost
+        self._pending = None
+
+    def revert(self):
+        """撤销上一次 propose_move / propose_swap 的改动"""
+        order = self.orders
+        for a, old in reversed(self._pending[1]):
+            order[a:a + len(old)] = old
+        self._pending = None
+
+def random_solution(N: int, M: int, rng=None) -> List[List[int]]:
+    rng = rng or random
     orders = []
     for _ in range(N):
         perm = list(range(M))
-        random.shuffle(perm)
+        rng.shuffle(perm)
         orders.append(perm)
     return orders
 
@@ -71,64 +494,609 @@ def heuristic_solution(N: int, M: int, durations: List[float]) -> List[List[int]
         orders.append(order)
     return orders
 
-def simulated_annealing(N: int, M: int, durations: List[float],
-                        max_iter: int = 5000, initial_temp: float = None,
-                        cooling_rate: float = 0.95) -> Tuple[List[List[int]], float]:
-    current = heuristic_solution(N, M, durations)
-    current_cost = simulate(current, durations)
+def lower_bound(N: int, durations: List[float]) -> float:
+    """任何方案总完成时间的下界（开放车间问题的经典下界）
+
+    每个人都要玩完所有游戏：sum(durations)；每张光碟要依次被 N 个人玩：N * max(durations)。
+    人数多于光碟数时，开局至少有一人要等最短的游戏结束才能开始：sum + min。
+    """
+    if not durations or N <= 0:
+        return 0.0
+    total = sum(durations)
+    bound = max(total, N * max(durations))
+    if N > len(durations):
+        bound = max(bound, total + min(durations))
+    return bound
+
+def reached_bound(cost: float, bound: float) -> bool:
+    return cost <= bound * (1 + 1e-9)
 
-    for _ in range(5):
-        cand = random_solution(N, M)
-        cost = simulate(cand, durations)
+def _draw_move(move: str, order: array, M: int, rng, people: List[int], fixed=None):
+    """随机生成一次 move 操作，返回 IncrementalSimulator.propose_move 的 edits，无法进行时返回 None
+
+    people 为可以改动的人，fixed[i] 为第 i 人不可改动的前缀长度（None 表示都可改动）。
+    """
+    if move == "cross":
+        if len(people) < 2:
+            return None
+        a, b = rng.sample(people, 2)
+        k = rng.randrange(max(fixed[a], fixed[b]) if fixed is not None else 0, M)
+        base_a, base_b = a * M, b * M
+        x, y = order[base_a + k], order[base_b + k]
+        if x == y:
+            return None
+        # a 在 k 处改玩 y、b 改玩 x，各自原来玩 y、x 的位置补上对方空出的光碟
+        pos_a = order[base_a:base_a + M].index(y)
+        pos_b = order[base_b:base_b + M].index(x)
+        if fixed is not None and (pos_a < fixed[a] or pos_b < fixed[b]):
+            return None
+        return [(a, k, (y,)), (a, pos_a, (x,)), (b, k, (x,)), (b, pos_b, (y,))]
+
+    person = rng.choice(people) if fixed is not None else rng.randint(0, len(people) - 1)
+    pos1, pos2 = rng.sample(range(fixed[person] if fixed is not None else 0, M), 2)
+    base = person * M
+    if move == "swap":
+        return [(person, pos1, (order[base + pos2],)), (person, pos2, (order[base + pos1],))]
+    lo, hi = min(pos1, pos2), max(pos1, pos2)
+    segment = order[base + lo:base + hi + 1]
+    if move == "insert":
+        # 把 pos1 处的任务挪到 pos2，中间的任务顺移一位
+        segment = segment[1:] + segment[:1] if pos1 < pos2 else segment[-1:] + segment[:-1]
+    else:
+        segment.reverse()
+    return [(person, lo, segment)]
+
+def _pick_move(weights: List[float], rng) -> int:
+    """按权重轮盘赌选择邻域操作的下标，每个操作至少有 MOVE_MIN_PROB 的概率"""
+    K = len(weights)
+    total = sum(weights)
+    r = rng.random()
+    for k, w in enumerate(weights):
+        r -= MOVE_MIN_PROB + (1 - K * MOVE_MIN_PROB) * (w / total if total > 0 else 1 / K)
+        if r < 0:
+            return k
+    return K - 1
+
+def _check_moves(moves) -> Tuple[str, ...]:
+    moves = tuple(moves)
+    if not moves:
+        raise ValueError("至少需要一种邻域操作")
+    unknown = [m for m in moves if m not in MOVES]
+    if unknown:
+        raise ValueError(f"未知的邻域操作: {unknown}，可选 {MOVES}")
+    return moves
+
+def _init_chain(N: int, M: int, durations: List[float], rng, max_iter: int,
+                initial_temp: float = None, population: int = POPULATION,
+                moves=MOVES) -> Dict[str, Any]:
+    """生成一条退火链的初始状态：启发式解加 population 个随机解一次性批量评估后择优"""
+    moves = _check_moves(moves)
+    if N < 2:
+        moves = tuple(m for m in moves if m != "cross") or ("swap",)
+    cands = [heuristic_solution(N, M, durations)]
+    cands.extend(random_solution(N, M, rng) for _ in range(population))
+    costs = simulate_batch(cands, durations)
+
+    current = cands[0]
+    current_cost = float(costs[0])
+    for cand, cost in zip(cands[1:], costs[1:]):
         if cost < current_cost:
             current = cand
-            current_cost = cost
-
-    best = [list(p) for p in current]
-    best_cost = current_cost
+            current_cost = float(cost)
 
     if initial_temp is None:
         initial_temp = current_cost * 10
 
-    temp = initial_temp
-    for _ in range(max_iter):
-        new = [list(p) for p in current]
-        person = random.randint(0, N - 1)
-        pos1, pos2 = random.sample(range(M), 2)
-        new[person][pos1], new[person][pos2] = new[person][pos2], new[person][pos1]
-
-        new_cost = simulate(new, durations)
-        delta = new_cost - current_cost
-
-        if delta < 0 or random.random() < math.exp(-delta / temp):
-            current = new
-            current_cost = new_cost
-            if current_cost < best_cost:
-                best = [list(p) for p in current]
-                best_cost = current_cost
-
-        temp *= cooling_rate
-        if temp < 1e-6:
+    # 链内部使用紧凑的一维数组，只在求解结束时还原为列表
+    current = pack_orders(current)
+    bound = lower_bound(N, durations)
+    return {
+        "N": N,
+        "bound": bound,
+        "current": current,
+        "current_cost": current_cost,
+        "best": array('H', current),
+        "best_cost": current_cost,
+        "initial_temp": initial_temp,
+        "temp": initial_temp,
+        "remaining": max_iter,
+        "done": max_iter <= 0 or reached_bound(current_cost, bound),
+        "moves": moves,
+        "move_weights": [1.0] * len(moves),
+    }
+
+def _anneal_iter(chain: Dict[str, Any], durations: List[float], steps: int,
+                 cooling_rate: float, rng, cache: CostCache = None, deadline: float = None,
+                 stats: "SolverStats" = None):
+    """在链状态上继续退火最多 steps 次（原地修改），每找到更优解就产出一次 chain
+
+    deadline 为 time.monotonic() 的截止时刻，到达后立即停止。给定 stats 时记录计数、耗时和收敛轨迹。
+    chain["moves"] 有多个邻域操作时，每次按 chain["move_weights"] 选择，并用该操作是否改进当前解
+    更新其权重；只有 swap 时与最初的单一交换邻域完全一致。
+    """
+    N = chain["N"]
+    M = len(durations)
+    current = chain["current"]
+    current_cost = chain["current_cost"]
+    best = chain["best"]
+    best_cost = chain["best_cost"]
+    temp = chain["temp"]
+    bound = chain["bound"]
+    # 重新规划时每人前 fixed[i] 个任务已完成或正在进行，只在其后交换
+    fixed = chain.get("fixed")
+    if fixed is not None:
+        people = [i for i in range(N) if M - fixed[i] >= 2]
+        if not people:
+            chain["done"] = True
+            return
+    else:
+        people = range(N)
+    moves = chain["moves"]
+    weights = chain["move_weights"]
+    move_used = [0] * len(moves)
+    move_improved = [0] * len(moves)
+
+    started = time.perf_counter()
+    # 增量评估：交换只影响其后的事件，从最近的检查点重新模拟即可
+    sim = IncrementalSimulator(current, N, durations, cache=cache, start=chain.get("start"))
+
+    steps = min(steps, chain["remaining"])
+    done = False
+    iterations = accepted = 0
+    eval_time = 0.0
+    trace_every = stats.trace_every if stats is not None else 0
+    try:
+        for _ in range(steps):
+            if deadline is not None and time.monotonic() >= deadline:
+                done = True
+                break
+
+            k = _pick_move(weights, rng) if len(moves) > 1 else 0
+            edits = _draw_move(moves[k], current, M, rng, people, fixed)
+            if edits is None:
+                # 例如 cross 抽到两人同一序号上是同一张光碟，这次改用 swap
+                edits = _draw_move("swap", current, M, rng, people, fixed)
+
+            t0 = time.perf_counter()
+            new_cost = sim.propose_move(edits)
+            eval_time += time.perf_counter() - t0
+            delta = new_cost - current_cost
+            move_used[k] += 1
+            if delta < 0:
+                move_improved[k] += 1
+            if len(moves) > 1:
+                weights[k] += MOVE_ADAPT_RATE * ((delta < 0) - weights[k])
+
+            improved = False
+            if delta < 0 or rng.random() < math.exp(-delta / temp):
+                t0 = time.perf_counter()
+                sim.commit()
+                eval_time += time.perf_counter() - t0
+                accepted += 1
+                current_cost = new_cost
+                if current_cost < best_cost:
+                    best = array('H', current)
+                    best_cost = current_cost
+                    improved = True
+            else:
+                sim.revert()
+
+            iterations += 1
+            chain["remaining"] -= 1
+            temp *= cooling_rate
+            if stats is not None:
+                if improved:
+                    stats.record_best(stats.iterations + iterations,
+                                      stats.simulations + sim.simulations, best_cost)
+                if trace_every and iterations % trace_every == 0:
+                    stats.record(stats.iterations + iterations, temp, current_cost, best_cost)
+            # 温度足够低，或已达到下界（不可能再改进）时停止
+            if temp < 1e-6 or reached_bound(best_cost, bound):
+                done = True
+            if improved:
+                chain.update(current_cost=current_cost, best=best, best_cost=best_cost, temp=temp)
+                yield chain
+            if done:
+                break
+
+        chain.update(current_cost=current_cost, best=best, best_cost=best_cost, temp=temp,
+                     done=done or chain["remaining"] <= 0)
+    finally:
+        # 调用方提前结束生成器时也要把本段的统计记上
+        if stats is not None:
+            stats.add_run(iterations, accepted, sim.simulations, eval_time,
+                          time.perf_counter() - started, temp)
+            stats.add_moves(moves, move_used, move_improved)
+
+def _anneal_chain(chain: Dict[str, Any], durations: List[float], steps: int,
+                  cooling_rate: float, rng, cache: CostCache = None,
+                  deadline: float = None, stats: "SolverStats" = None) -> Dict[str, Any]:
+    """在链状态上继续退火最多 steps 次（原地修改并返回）"""
+    for _ in _anneal_iter(chain, durations, steps, cooling_rate, rng, cache, deadline, stats):
+        pass
+    return chain
+
+def simulated_annealing(N: int, M: int, durations: List[float],
+                        max_iter: int = 5000, initial_temp: float = None,
+                        cooling_rate: float = 0.95, rng=None, population: int = POPULATION,
+                        cache: CostCache = None, stats: SolverStats = None,
+                        moves=MOVES) -> Tuple[List[List[int]], float]:
+    """cache 为可选的 CostCache，跳过重复方案的模拟，命中统计可从其 hits/misses 读取；
+    stats 为可选的 SolverStats，记录计数、耗时和收敛轨迹；moves 为使用的邻域操作（见 MOVES）"""
+    rng = rng or random
+    t0 = time.perf_counter()
+    chain = _init_chain(N, M, durations, rng, max_iter, initial_temp, population, moves)
+    if stats is not None:
+        stats.init_time += time.perf_counter() - t0
+        stats.note_best(0, 0, chain["best_cost"])
+    if not chain["done"]:
+        _anneal_chain(chain, durations, max_iter, cooling_rate, rng, cache, stats=stats)
+    return unpack_orders(chain["best"], N), chain["best_cost"]
+
+# 各链的代价缓存留在执行它的进程中，不随链状态来回传递
+_chain_caches: Dict[Any, CostCache] = {}
+
+def _chain_round(args):
+    """进程池任务：恢复随机数状态后把一条链推进一轮
+
+    返回链状态、随机数状态、本轮缓存命中/未命中数和缓存条目数以及本轮统计（未要求时为 None）。
+    """
+    (chain, rng_state, durations, steps, cooling_rate, cache_key, cache_size,
+     deadline, with_stats) = args
+    rng = random.Random()
+    rng.setstate(rng_state)
+    cache = None
+    if cache_size > 0:
+        cache = _chain_caches.get(cache_key)
+        if cache is None:
+            cache = _chain_caches[cache_key] = CostCache(cache_size)
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    stats = SolverStats(trace_every=0) if with_stats else None
+    _anneal_chain(chain, durations, steps, cooling_rate, rng, cache, deadline, stats)
+    size = 0
+    if cache is not None:
+        hits, misses, size = cache.hits - hits, cache.misses - misses, len(cache)
+    return chain, rng.getstate(), (hits, misses, size), stats.as_dict() if stats else None
+
+def multi_start_annealing(N: int, M: int, durations: List[float], restarts: int = 4,
+                          workers: int = 1, seed: int = None, sync_every: int = 100,
+                          max_iter: int = 5000, initial_temp: float = None,
+                          cooling_rate: float = 0.95, population: int = POPULATION,
+                          cache: CostCache = None, deadline: float = None,
+                          stats: SolverStats = None,
+                          moves=MOVES) -> Tuple[List[List[int]], float]:
+    """多条独立播种的退火链并行搜索，返回全局最优
+
+    各链按 sync_every 次迭代同步一轮：每轮结束后，当前解最差的链改从全局最优解继续。
+    同步只在轮与轮之间进行，因此结果只取决于 seed 和 restarts，与 workers 无关。
+    给定 cache 时每条链在其所在进程中各自使用容量为 cache.maxsize 的缓存，命中统计累加到 cache 上，
+    各链缓存的条目数之和记在 cache.worker_size。
+    deadline（time.monotonic() 时刻）到达后所有链停止，此时结果不再保证可复现；所有链降温结束时
+    若 deadline 还没到，各链从自己的最优解重新升温继续搜索（同 solve_iter 的单链），直到截止。
+    给定 stats 时累加各链计数和耗时，轨迹按轮记录 (总迭代次数, None, None, 全局最优)，
+    最优解出现时机也按轮记录。
+    """
+    t0 = time.perf_counter()
+    master = random.Random(seed)
+    rngs = [random.Random(master.getrandbits(64)) for _ in range(restarts)]
+    chains = [_init_chain(N, M, durations, rng, max_iter, initial_temp, population, moves)
+              for rng in rngs]
+    global_best = min(chain["best_cost"] for chain in chains)
+    if stats is not None:
+        stats.init_time += time.perf_counter() - t0
+        stats.note_best(0, 0, global_best)
+    rng_states = [rng.getstate() for rng in rngs]
+    run_id = uuid.uuid4().hex
+    cache_size = cache.maxsize if cache is not None else 0
+    cache_sizes = [0] * restarts
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while True:
+            active = [k for k, chain in enumerate(chains) if not chain["done"]]
+            if not active:
+                if deadline is None or max_iter <= 0 or time.monotonic() >= deadline or \
+                        reached_bound(global_best, chains[0]["bound"]):
+                    break
+                # 重新升温：各链从自己的最优解开始新一轮降温
+                for chain in chains:
+                    chain.update(current=array('H', chain["best"]), current_cost=chain["best_cost"],
+                                 temp=chain["initial_temp"], remaining=max_iter, done=False)
+                active = list(range(restarts))
+            jobs = [(chains[k], rng_states[k], durations, sync_every, cooling_rate,
+                     (run_id, k), cache_size, deadline, stats is not None) for k in active]
+            results = pool.map(_chain_round, jobs) if pool else map(_chain_round, jobs)
+            for k, (chain, rng_state, (hits, misses, size), chain_stats) in zip(active, results):
+                chains[k] = chain
+                rng_states[k] = rng_state
+                if cache is not None:
+                    cache.hits += hits
+                    cache.misses += misses
+                    cache_sizes[k] = size
+                    cache.worker_size = sum(cache_sizes)
+                if stats is not None:
+                    stats.merge(chain_stats)
+
+            # 共享最优：当前解最差的活动链从全局最优解继续搜索
+            best_k = min(range(restarts), key=lambda k: (chains[k]["best_cost"], k))
+            best_chain = chains[best_k]
+            if stats is not None:
+                if best_chain["best_cost"] < global_best:
+                    stats.note_best(stats.iterations, stats.simulations, best_chain["best_cost"])
+                if stats.trace_every:
+                    stats.record(stats.iterations, None, None, best_chain["best_cost"])
+            global_best = best_chain["best_cost"]
+            if reached_bound(best_chain["best_cost"], best_chain["bound"]):
+                break
+            active = [k for k in active if not chains[k]["done"]]
+            if active:
+                worst_k = max(active, key=lambda k: (chains[k]["current_cost"], k))
+                if chains[worst_k]["current_cost"] > best_chain["best_cost"]:
+                    chains[worst_k]["current"] = array('H', best_chain["best"])
+                    chains[worst_k]["current_cost"] = best_chain["best_cost"]
+    finally:
+        if pool:
+            pool.shutdown()
+        for k in range(restarts):
+            _chain_caches.pop((run_id, k), None)
+
+    best_k = min(range(restarts), key=lambda k: (chains[k]["best_cost"], k))
+    return unpack_orders(chains[best_k]["best"], N), chains[best_k]["best_cost"]
+
+def _solution(names: List[str], orders: List[List[int]], cost: float, bound: float,
+              elapsed: float, cache: CostCache = None) -> Dict[str, Any]:
+    gap = (cost - bound) / bound if bound > 0 else 0.0
+    solution = {
+        "allocation": [[names[i] for i in person_orders] for person_orders in orders],
+        "makespan": cost,
+        "lower_bound": bound,
+        "gap": 0.0 if reached_bound(cost, bound) else gap,
+        "elapsed": elapsed,
+    }
+    if cache is not None:
+        solution["cache"] = cache.stats()
+    return solution
+
+def _search(chain: Dict[str, Any], durations: List[float], max_iter: int, rng,
+            cache: CostCache = None, deadline: float = None, stats: SolverStats = None,
+            cooling_rate: float = 0.95):
+    """单链搜索，每当最优解改进时产出 chain；有 deadline 时降温结束后从最优解重新升温直到截止"""
+    best_cost = chain["best_cost"]
+    while not reached_bound(best_cost, chain["bound"]) and max_iter > 0:
+        for chain in _anneal_iter(chain, durations, max_iter, cooling_rate, rng, cache, deadline,
+                                  stats):
+            if chain["best_cost"] < best_cost:
+                best_cost = chain["best_cost"]
+                yield chain
+        if deadline is None or time.monotonic() >= deadline:
             break
+        # 重新升温：从当前最优解开始新一轮降温
+        chain.update(current=array('H', chain["best"]), current_cost=chain["best_cost"],
+                     temp=chain["initial_temp"], remaining=max_iter, done=False)
 
-    return best, best_cost
+def solve_iter(tasks: List[Dict[str, Any]], num_people: int, time_limit: float = None,
+               seed: int = None, cache_size: int = 0, max_iter: int = 5000,
+               stats: SolverStats = None, moves=MOVES, population: int = POPULATION,
+               cooling_rate: float = 0.95):
+    """随时可用的求解器：每找到更优方案就产出一次结果（字段同 solve()，elapsed 为已用秒数）
 
-def allocate_tasks(tasks: List[Dict[str, Any]], num_people: int) -> List[List[str]]:
+    第一个结果是初始解，几乎立即产出。time_limit（秒）为硬性截止时间，链降温结束后若仍有剩余时间，
+    从当前最优解重新升温继续搜索。不设 time_limit 时只跑一条链，与 solve() 单链求解结果一致。
+    stats 为可选的 SolverStats，moves 为使用的邻域操作（见 MOVES），population、cooling_rate 见 solve()。
+    """
+    start = time.monotonic()
+    deadline = start + time_limit if time_limit is not None else None
     durations = [t['duration'] for t in tasks]
     names = [t['name'] for t in tasks]
     M = len(tasks)
     N = num_people
 
     if M == 0:
-        return [[] for _ in range(N)]
+        yield _solution(names, [[] for _ in range(N)], 0.0, 0.0, time.monotonic() - start)
+        return
+
+    rng = random.Random(seed) if seed is not None else random
+    cache = CostCache(cache_size) if cache_size > 0 else None
+    t0 = time.perf_counter()
+    chain = _init_chain(N, M, durations, rng, max_iter, population=population, moves=moves)
+    if stats is not None:
+        stats.init_time += time.perf_counter() - t0
+        stats.note_best(0, 0, chain["best_cost"])
+    bound = chain["bound"]
+    solution = _solution(names, unpack_orders(chain["best"], N), chain["best_cost"], bound,
+                         time.monotonic() - start, cache)
+    yield solution
+
+    for chain in _search(chain, durations, max_iter, rng, cache, deadline, stats, cooling_rate):
+        solution = _solution(names, unpack_orders(chain["best"], N), chain["best_cost"], bound,
+                             time.monotonic() - start, cache)
+        yield solution
+
+    # 搜索结束时把最后一个结果的缓存统计更新为最终值
+    if cache is not None:
+        solution["cache"] = cache.stats()
+
+def solve(tasks: List[Dict[str, Any]], num_people: int, workers: int = 1,
+          restarts: int = None, seed: int = None, cache_size: int = 0,
+          time_limit: float = None, stats: SolverStats = None,
+          moves=MOVES, population: int = POPULATION,
+          cooling_rate: float = 0.95) -> Dict[str, Any]:
+    """求解并返回分配方案、总完成时间、下界以及相对下界的差距（gap 为 0 表示已证明最优）
+
+    workers 为并行进程数，restarts 为退火链条数（默认与 workers 相同），给定 seed 时结果可复现。
+    cache_size > 0 时启用代价缓存，结果中附带 cache 命中统计。time_limit 为求解时间上限（秒）。
+    stats 为可选的 SolverStats，求解后可读取计数、耗时和收敛轨迹。
+    moves 为退火使用的邻域操作（见 MOVES），多个时按近期改进率自适应选择。
+    population 为每条链初始解的随机候选数，与启发式解一起评估后择优；
+    候选数达到 BATCH_MIN_CANDIDATES 且安装了 numpy 时一次批量评估。
+    cooling_rate 为每次迭代后温度乘的系数，越接近 1 降温越慢、每轮搜索越久。
+    """
+    if restarts is None:
+        restarts = workers
+    start = time.monotonic()
+    if restarts <= 1 or not tasks:
+        solution = None
+        for solution in solve_iter(tasks, num_people, time_limit=time_limit, seed=seed,
+                                   cache_size=cache_size, stats=stats, moves=moves,
+                                   population=population, cooling_rate=cooling_rate):
+            pass
+        solution["elapsed"] = time.monotonic() - start
+        return solution
+
+    deadline = start + time_limit if time_limit is not None else None
+    durations = [t['duration'] for t in tasks]
+    names = [t['name'] for t in tasks]
+    cache = CostCache(cache_size) if cache_size > 0 else None
+    best_orders, best_cost = multi_start_annealing(num_people, len(tasks), durations,
+                                                   restarts=restarts, workers=workers, seed=seed,
+                                                   cooling_rate=cooling_rate,
+                                                   population=population, cache=cache,
+                                                   deadline=deadline, stats=stats, moves=moves)
+    return _solution(names, best_orders, best_cost, lower_bound(num_people, durations),
+                     time.monotonic() - start, cache)
+
+def allocate_tasks(tasks: List[Dict[str, Any]], num_people: int, workers: int = 1,
+                   restarts: int = None, seed: int = None,
+                   population: int = POPULATION) -> List[List[str]]:
+    return solve(tasks, num_people, workers=workers, restarts=restarts, seed=seed,
+                 population=population)["allocation"]
+
+def replan(tasks: List[Dict[str, Any]], allocation: List[List[str]], done: List[List[str]],
+           playing: Dict[int, Tuple[str, float]] = None, left=(), time_limit: float = None,
+           seed: int = None, max_iter: int = 5000, moves=MOVES,
+           cooling_rate: float = 0.95) -> Dict[str, Any]:
+    """中途发生变化后只重新优化剩余部分，以之前的方案为初始解
+
+    tasks: 变化后的完整任务列表（可新增光碟或修改时长）
+    allocation: 之前的方案，每人一个任务名列表
+    done: 每人已玩完的任务名列表，与 allocation 一一对应
+    playing: {人的编号: (任务名, 剩余时长)}，此刻正在玩的任务
+    left: 离开的人的编号，他们正在玩的光碟立即空出
+
+    返回字段同 solve()，时间从此刻算起；allocation 只包含每个留下的人接下来要玩的任务，
+    people 为这些人在原方案中的编号。
+    """
+    start_time = time.monotonic()
+    deadline = start_time + time_limit if time_limit is not None else None
+    playing = playing or {}
+    left = set(left)
+    names = [t['name'] for t in tasks]
+    durations = [t['duration'] for t in tasks]
+    index = {name: j for j, name in enumerate(names)}
+    M = len(tasks)
+    people = [i for i in range(len(allocation)) if i not in left]
+    N = len(people)
 
-    best_orders, _ = simulated_annealing(N, M, durations)
+    orders, fixed, events = [], [], []
+    avail = [0.0] * M
+    for k, i in enumerate(people):
+        prefix = [index[name] for name in done[i]]
+        if i in playing:
+            name, remaining = playing[i]
+            j = index[name]
+            prefix.append(j)
+            events.append((float(remaining), k, j))
+            avail[j] = float(remaining)
+        taken = set(prefix)
+        # 沿用之前方案中剩余任务的相对顺序，新增的任务排在最后
+        suffix = [index[name] for name in allocation[i]
+                  if name in index and index[name] not in taken]
+        seen = taken | set(suffix)
+        suffix.extend(j for j in range(M) if j not in seen)
+        orders.append(prefix + suffix)
+        fixed.append(len(prefix))
+
+    # 剩余部分的下界：每人剩余的总时长，以及每张光碟剩余被占用的总时长
+    loads = [0.0]
+    disc_loads = list(avail)
+    for k in range(N):
+        remaining = [orders[k][p] for p in range(fixed[k], M)]
+        loads.append(sum(durations[j] for j in remaining) +
+                     sum(end for end, i, _ in events if i == k))
+        for j in remaining:
+            disc_loads[j] += durations[j]
+    bound = max(loads + disc_loads)
+
+    start = (list(fixed), events, avail)
+    current = pack_orders(orders)
+    cost = IncrementalSimulator(current, N, durations, start=start).cost if N else 0.0
+    chain = {
+        "N": N,
+        "bound": bound,
+        "current": current,
+        "current_cost": cost,
+        "best": array('H', current),
+        "best_cost": cost,
+        "initial_temp": cost * 10,
+        "temp": cost * 10,
+        "remaining": max_iter,
+        "done": reached_bound(cost, bound),
+        "fixed": fixed,
+        "start": start,
+        "moves": _check_moves(moves),
+        "move_weights": [1.0] * len(moves),
+    }
+
+    rng = random.Random(seed) if seed is not None else random
+    for chain in _search(chain, durations, max_iter, rng, deadline=deadline,
+                         cooling_rate=cooling_rate):
+        pass
 
-    result = []
-    for person_orders in best_orders:
-        result.append([names[i] for i in person_orders])
+    orders = unpack_orders(chain["best"], N)
+    solution = _solution(names, [order[f:] for order, f in zip(orders, fixed)],
+                         chain["best_cost"], bound, time.monotonic() - start_time)
+    solution["people"] = people
+    return solution
+
+def _solve_instance(args) -> Dict[str, Any]:
+    """批量模式的单个实例：解析一行 JSON 并求解，出错时返回 error 字段而不是抛出异常"""
+    line, defaults = args
+    result = {}
+    try:
+        inst = json.loads(line)
+        if "id" in inst:
+            result["id"] = inst["id"]
+        if "tasks" in inst:
+            tasks = [{"name": t["name"], "duration": float(t["duration"])} for t in inst["tasks"]]
+        else:
+            if len(inst["names"]) != len(inst["durations"]):
+                raise ValueError("任务名数量与时长数量不一致")
+            tasks = [{"name": n, "duration": float(d)}
+                     for n, d in zip(inst["names"], inst["durations"])]
+        result.update(solve(tasks, int(inst.get("num_people", 2)),
+                            seed=inst.get("seed", defaults["seed"]),
+                            time_limit=inst.get("time_limit", defaults["time_limit"]),
+                            cache_size=inst.get("cache_size", defaults["cache_size"]),
+                            moves=defaults["moves"],
+                            population=int(inst.get("population", defaults["population"]))))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
     return result
 
+def solve_batch(lines, workers: int = 1, seed: int = None, time_limit: float = None,
+                cache_size: int = 0, moves=MOVES, population: int = POPULATION):
+    """批量求解：每行一个 JSON 实例，在进程池中并发求解，按输入顺序逐个产出结果
+
+    实例格式为 {"tasks": [{"name": ..., "duration": ...}, ...], "num_people": 2} 或
+    {"names": [...], "durations": [...], "num_people": 2}，可选 id/seed/time_limit/cache_size/population，
+    未指定的使用这里的默认值。同时在途的实例数有上限，输入可以是流。
+    """
+    defaults = {"seed": seed, "time_limit": time_limit, "cache_size": cache_size,
+                "moves": moves, "population": population}
+    jobs = ((line, defaults) for line in lines if line.strip())
+    if workers <= 1:
+        yield from map(_solve_instance, jobs)
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            pending.append(pool.submit(_solve_instance, job))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
 # ---------- 命令行入口 ----------
 
 def parse_list_arg(arg: str):
@@ -141,15 +1109,64 @@ def parse_list_arg(arg: str):
     parts = arg.split(',')
     return [p.strip() for p in parts]
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="为每个人规划游戏顺序，使总完成时间最小",
+        epilog="示例: python assign_tasks.py \"火焰纹章,忍者龙剑传\" \"32,10.5\" 2",
+    )
+    parser.add_argument("names", nargs="?", help="任务名列表，英文逗号分隔")
+    parser.add_argument("durations", nargs="?", help="时长列表，与任务名一一对应")
+    parser.add_argument("num_people", nargs="?", type=int, default=2, help="人数，默认为 2")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数，默认为 1")
+    parser.add_argument("--restarts", type=int, default=None, help="独立退火链条数，默认与 --workers 相同")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，指定后结果可复现")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="求解时间上限（秒），时间内会持续改进，不设置则按固定降温过程运行")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="代价缓存容量（方案数），0 表示不启用，启用后输出命中统计")
+    parser.add_argument("--moves", type=parse_list_arg, default=list(MOVES),
+                        help=f"退火使用的邻域操作，英文逗号分隔，可选 {','.join(MOVES)}，默认全部"
+                             "（按近期改进率自适应选择），只用 swap 时与早期版本一致")
+    parser.add_argument("--population", type=int, default=POPULATION,
+                        help=f"每条退火链初始解的随机候选数，默认 {POPULATION}；"
+                             f"不少于 {BATCH_MIN_CANDIDATES} 且安装了 numpy 时一次向量化评估")
+    parser.add_argument("--stats", action="store_true",
+                        help="输出求解统计：迭代与接受次数、模拟耗时、最优解出现的时机等")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="批量模式：从文件（省略或为 - 时从标准输入）逐行读取 JSON 实例，"
+                             "用 --workers 个进程并发求解，按输入顺序逐行输出 JSON 结果")
+    return parser
+
+def run_batch(args):
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    try:
+        for result in solve_batch(source, workers=args.workers, seed=args.seed,
+                                  time_limit=args.time_limit, cache_size=args.cache_size,
+                                  moves=args.moves, population=args.population):
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
 def main():
-    if len(sys.argv) < 3:
-        print("用法: python assign_tasks.py \"任务名1,任务名2,...\" \"时长1,时长2,...\" [人数]")
-        print("示例: python assign_tasks.py \"火焰纹章,忍者龙剑传\" \"32,10.5\" 2")
-        sys.exit(1)
+    parser = build_arg_parser()
+    args = parser.parse_args()
+    try:
+        _check_moves(args.moves)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.population < 0:
+        parser.error("--population 不能为负数")
+
+    if args.batch is not None:
+        run_batch(args)
+        return
+    if args.names is None or args.durations is None:
+        parser.error("需要任务名列表和时长列表，或使用 --batch")
 
-    names_str = sys.argv[1]
-    durations_str = sys.argv[2]
-    num_people = int(sys.argv[3]) if len(sys.argv) >= 4 else 2
+    names_str = args.names
+    durations_str = args.durations
+    num_people = args.num_people
 
     names = parse_list_arg(names_str)
     durations = parse_list_arg(durations_str)
@@ -166,10 +1183,21 @@ def main():
 
     tasks = [{"name": n, "duration": d} for n, d in zip(names, durations)]
 
-    allocation = allocate_tasks(tasks, num_people)
+    stats = SolverStats() if args.stats else None
+    result = solve(tasks, num_people, workers=args.workers,
+                   restarts=args.restarts, seed=args.seed, cache_size=args.cache_size,
+                   time_limit=args.time_limit, stats=stats, moves=args.moves,
+                   population=args.population)
 
-    for i, order in enumerate(allocation):
+    for i, order in enumerate(result["allocation"]):
         print(f"{i}: {order}")
+    print(f"总完成时间: {result['makespan']:g}，下界: {result['lower_bound']:g}，"
+          f"差距: {result['gap'] * 100:.2f}%")
+    if "cache" in result:
+        cache = result["cache"]
+        print(f"缓存命中: {cache['hits']}，未命中: {cache['misses']}")
+    if stats is not None:
+        print(stats.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""assign_games.py 的基准测试：规模扩展性与解的质量
+
+用固定种子生成不同人数、游戏数和时长分布的实例，记录墙钟时间、每秒模拟次数、峰值内存，
+最终总完成时间相对下界的差距，以及达到目标质量（下界的 1 + --target-gap 倍）所需的模拟次数，
+输出 JSON 报告。用 --compare 与之前的报告对比，防止提速的同时悄悄降低方案质量；
+用 --moves 固定邻域操作，可对比不同邻域达到同一质量所需的评估次数。
+
+python bench_assign_games.py --grid quick --output bench.json
+python bench_assign_games.py --grid quick --compare bench.json
+python bench_assign_games.py --moves swap --output swap.json
+python bench_assign_games.py --compare swap.json
+"""
+import sys
+import json
+import math
+import random
+import time
+import platform
+import argparse
+import tracemalloc
+from typing import List, Dict, Any
+
+import assign_games
+
+GRIDS = {
+    "quick": {"people": [2, 4, 8], "tasks": [4, 10, 25], "dists": ["uniform", "skewed"]},
+    "full": {"people": [2, 4, 8, 16, 32], "tasks": [4, 10, 25, 50, 100, 200],
+             "dists": ["uniform", "skewed", "heavy"]},
+}
+
+def make_durations(M: int, dist: str, rng: random.Random) -> List[float]:
+    """uniform: 1~10 均匀；skewed: 对数正态（长尾）；heavy: 九成短游戏加一成超长游戏"""
+    if dist == "uniform":
+        values = [rng.uniform(1, 10) for _ in range(M)]
+    elif dist == "skewed":
+        values = [rng.lognormvariate(1, 1) for _ in range(M)]
+    elif dist == "heavy":
+        values = [rng.uniform(20, 40) if rng.random() < 0.1 else rng.uniform(1, 3)
+                  for _ in range(M)]
+    else:
+        raise ValueError(f"未知的时长分布: {dist}")
+    return [round(v, 2) for v in values]
+
+def make_instance(N: int, M: int, dist: str, seed: int) -> Dict[str, Any]:
+    rng = random.Random(f"{N}-{M}-{dist}-{seed}")
+    durations = make_durations(M, dist, rng)
+    return {
+        "name": f"N{N}_M{M}_{dist}",
+        "num_people": N,
+        "tasks": [{"name": f"g{j}", "duration": d} for j, d in enumerate(durations)],
+    }
+
+def run_instance(inst: Dict[str, Any], seed: int, time_limit: float = None,
+                 measure_memory: bool = True, moves=assign_games.MOVES,
+                 target_gap: float = 0.05) -> Dict[str, Any]:
+    stats = assign_games.SolverStats(trace_every=0)
+    t0 = time.perf_counter()
+    result = assign_games.solve(inst["tasks"], inst["num_people"], seed=seed,
+                                time_limit=time_limit, stats=stats, moves=moves)
+    wall = time.perf_counter() - t0
+    target = result["lower_bound"] * (1 + target_gap)
+
+    record = {
+        "name": inst["name"],
+        "people": inst["num_people"],
+        "tasks": len(inst["tasks"]),
+        "wall_time": wall,
+        "iterations": stats.iterations,
+        "simulations": stats.simulations,
+        "sims_per_sec": stats.simulations / stats.eval_time if stats.eval_time else None,
+        "makespan": result["makespan"],
+        "lower_bound": result["lower_bound"],
+        "gap": result["gap"],
+        # 未达到目标质量时为 None
+        "evals_to_target": stats.evaluations_to(target),
+        "moves": stats.moves,
+    }
+    if measure_memory:
+        # 单独再跑一次测内存，避免 tracemalloc 的开销影响计时；种子相同，结果一致
+        tracemalloc.start()
+        assign_games.solve(inst["tasks"], inst["num_people"], seed=seed, time_limit=time_limit,
+                           moves=moves)
+        record["peak_mem_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return record
+
+def run_benchmark(grid: str, seed: int, time_limit: float = None,
+                  measure_memory: bool = True, moves=assign_games.MOVES,
+                  target_gap: float = 0.05, log=sys.stderr) -> Dict[str, Any]:
+    spec = GRIDS[grid]
+    results = []
+    for dist in spec["dists"]:
+        for N in spec["people"]:
+            for M in spec["tasks"]:
+                inst = make_instance(N, M, dist, seed)
+                record = run_instance(inst, seed, time_limit, measure_memory, moves, target_gap)
+                results.append(record)
+                print(f"{record['name']:<22} {record['wall_time']:8.3f} s  "
+                      f"gap {record['gap'] * 100:6.2f}%  "
+                      f"evals {_format_evals(record['evals_to_target'])}", file=log)
+
+    gaps = [r["gap"] for r in results]
+    evals = [r["evals_to_target"] for r in results if r["evals_to_target"] is not None]
+    return {
+        "meta": {
+            "grid": grid,
+            "seed": seed,
+            "time_limit": time_limit,
+            "moves": list(moves),
+            "target_gap": target_gap,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": assign_games.np is not None,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "summary": {
+            "total_wall_time": sum(r["wall_time"] for r in results),
+            "mean_gap": sum(gaps) / len(gaps) if gaps else 0.0,
+            "optimal": sum(1 for g in gaps if g == 0.0),
+            "reached_target": len(evals),
+            "mean_evals_to_target": round(sum(evals) / len(evals), 1) if evals else None,
+            "instances": len(results),
+        },
+    }
+
+def _format_evals(evals) -> str:
+    return "-" if evals is None else str(evals)
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], gap_tolerance: float = 1e-9) -> int:
+    """逐实例对比两份报告，打印提速倍数和差距变化，返回质量变差的实例数"""
+    old_by_name = {r["name"]: r for r in old["results"]}
+    regressions = 0
+    print(f"{'实例':<22} {'旧耗时':>9} {'新耗时':>9} {'提速':>7} {'旧差距':>8} {'新差距':>8} "
+          f"{'旧评估数':>8} {'新评估数':>8}")
+    for r in new["results"]:
+        o = old_by_name.get(r["name"])
+        if o is None:
+            continue
+        speedup = o["wall_time"] / r["wall_time"] if r["wall_time"] > 0 else math.inf
+        worse = r["gap"] > o["gap"] + gap_tolerance
+        regressions += worse
+        print(f"{r['name']:<22} {o['wall_time']:9.3f} {r['wall_time']:9.3f} {speedup:6.2f}x "
+              f"{o['gap'] * 100:7.2f}% {r['gap'] * 100:7.2f}% "
+              f"{_format_evals(o.get('evals_to_target')):>8} "
+              f"{_format_evals(r.get('evals_to_target')):>8}{'  <-- 变差' if worse else ''}")
+    old_total = old["summary"]["total_wall_time"]
+    new_total = new["summary"]["total_wall_time"]
+    print(f"总耗时 {old_total:.3f} s -> {new_total:.3f} s，"
+          f"平均差距 {old['summary']['mean_gap'] * 100:.2f}% -> {new['summary']['mean_gap'] * 100:.2f}%，"
+          f"质量变差 {regressions} 个")
+    print(f"达到目标质量 {old['summary'].get('reached_target', '-')} -> "
+          f"{new['summary']['reached_target']} 个，平均评估次数 "
+          f"{_format_evals(old['summary'].get('mean_evals_to_target'))} -> "
+          f"{_format_evals(new['summary']['mean_evals_to_target'])}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="assign_games.py 基准测试")
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick", help="实例规模网格")
+    parser.add_argument("--seed", type=int, default=0, help="实例生成与求解的随机种子")
+    parser.add_argument("--time-limit", type=float, default=None, help="每个实例的求解时间上限（秒）")
+    parser.add_argument("--moves", type=assign_games.parse_list_arg,
+                        default=list(assign_games.MOVES), help="退火使用的邻域操作，英文逗号分隔")
+    parser.add_argument("--target-gap", type=float, default=0.05,
+                        help="目标质量：总完成时间不超过下界的 1 + TARGET_GAP 倍，默认 0.05")
+    parser.add_argument("--no-memory", action="store_true", help="不测峰值内存（省去第二次运行）")
+    parser.add_argument("--output", help="把 JSON 报告写入文件，默认输出到标准输出")
+    parser.add_argument("--compare", metavar="REPORT", help="与之前的 JSON 报告对比，质量变差时返回非零")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.grid, args.seed, args.time_limit, not args.no_memory,
+                           args.moves, args.target_gap)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        if compare(old, report):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,614 @@
+"""掉落爆率配置的核心计算（不依赖 Qt），供 dnf_rarity_dicision 界面和命令行批量处理共用
+
+爆率表为累积阈值：每组 品级数 + 1 个整数，前几个是各品级区间的上界（满值 SCALE），
+最后一个是哨兵 SCALE + 1。掷点落在 (上一阈值, 本阈值] 内即得到该品级，超过最后一个有效阈值为空掉落。
+
+python dnf_rarity_core.py analyze dump.txt --output result.csv
+python dnf_rarity_core.py analyze dump.txt --format json --output result.json
+python dnf_rarity_core.py simulate dump.txt --rolls 10000000 --workers 4 --output sim.csv
+python dnf_rarity_core.py generate rates.csv --output tables.txt
+"""
+import re
+import math
+import sys
+import csv
+import json
+import time
+import unicodedata
+import argparse
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SCALE = 1_000_000
+TIER_NAMES = ("白色", "蓝色", "紫色", "粉色", "黄色")
+
+def default_tier_names(tiers: int):
+    """五个品级时用白蓝紫粉黄，其他数量时依次编号"""
+    return TIER_NAMES if tiers == len(TIER_NAMES) else tuple(f"品级{i}" for i in range(1, tiers + 1))
+
+# 按块读取文件，块边界处被截断的数字留到下一块
+READ_CHUNK_BYTES = 4 * 1024 * 1024
+# 只接受由空白分隔的整数，其余内容忽略（与原来 re.split + int() 的做法一致）
+_INT_TOKEN = re.compile(rb"(?<!\S)[+-]?[0-9]+(?!\S)")
+_WHITESPACE = b" \t\r\n\f\v"
+# ASCII 以外的十进制数字，如全角数字
+_UNICODE_DIGITS = re.compile(r"(?:(?![0-9])\d)+")
+
+# 异常标记，按位组合
+FLAG_DECREASING = 1  # 阈值小于前面的阈值，该品级区间被遮蔽，宽度为 0
+FLAG_CLAMPED = 2     # 阈值小于 0 或大于满值，已截断到 [0, 满值]
+FLAG_EMPTY = 4       # 最后一个有效阈值小于满值，存在空掉落
+FLAG_SENTINEL = 8    # 哨兵不等于 满值 + 1
+FLAG_NAMES = {
+    FLAG_DECREASING: "阈值递减",
+    FLAG_CLAMPED: "超出范围",
+    FLAG_EMPTY: "空掉落",
+    FLAG_SENTINEL: "哨兵异常",
+}
+
+def _normalize_text(text: str) -> str:
+    """把 Unicode 空白（不换行空格、全角空格等）换成空格，ASCII 以外的十进制数字换成 ASCII 数字"""
+    text = " ".join(text.split())
+    return _UNICODE_DIGITS.sub(lambda m: "".join(str(unicodedata.digit(c)) for c in m.group()), text)
+
+def _parse_ints(data: bytes) -> np.ndarray:
+    tokens = data.split()
+    if not tokens:
+        return np.empty(0, dtype=np.int64)
+    try:
+        # 通常全是数字，整块直接转换；夹杂其他内容时再用正则挑出整数
+        return np.array(tokens).astype(np.int64)
+    except ValueError:
+        pass
+    except OverflowError:
+        raise ValueError("数据中有超出 64 位整数范围的数字") from None
+    if not data.isascii():
+        # bytes.split() 只认 ASCII 空白，先规范化，与原来 re.split(r'\s+') + int() 接受的写法一致
+        data = _normalize_text(data.decode("utf-8", errors="replace")).encode("utf-8")
+    tokens = _INT_TOKEN.findall(data)
+    if not tokens:
+        return np.empty(0, dtype=np.int64)
+    try:
+        return np.array(tokens).astype(np.int64)
+    except OverflowError:
+        raise ValueError("数据中有超出 64 位整数范围的数字") from None
+
+def _to_groups(chunks, tiers: int) -> np.ndarray:
+    numbers = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+    size = tiers + 1
+    if len(numbers) % size != 0:
+        raise ValueError(f"检测到的数字总数不是{size}的倍数（共{len(numbers)}个），"
+                         f"请检查每组是否恰好{size}个数字。")
+    return numbers.reshape(-1, size)
+
+def parse_text(text: str, tiers: int = len(TIER_NAMES)) -> np.ndarray:
+    """把粘贴的文本解析为 (组数, tiers + 1) 的 int64 数组"""
+    return _to_groups([_parse_ints(text.encode("utf-8"))], tiers)
+
+def parse_file(path: str, tiers: int = len(TIER_NAMES),
+               chunk_bytes: int = READ_CHUNK_BYTES) -> np.ndarray:
+    """按块读取文件并解析为 (组数, tiers + 1) 的 int64 数组，不必把整个文件读成一个字符串"""
+    chunks = []
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            data = tail + block
+            cut = max(data.rfind(c) for c in _WHITESPACE)
+            # 块内没有空白时整块留到下一次
+            tail = data[cut + 1:]
+            chunks.append(_parse_ints(data[:cut + 1]))
+    chunks.append(_parse_ints(tail))
+    return _to_groups(chunks, tiers)
+
+class DropTableAnalysis:
+    """一次性计算所有组的各品级区间宽度、空掉落宽度和异常标记
+
+    thresholds: (组数, 品级数 + 1) 整数数组；widths: (组数, 品级数) 各品级区间宽度；
+    empty: 空掉落宽度；flags: FLAG_* 按位组合。宽度除以 scale 即为概率。
+    """
+
+    def __init__(self, thresholds, scale: int = SCALE, tier_names=TIER_NAMES):
+        thresholds = np.asarray(thresholds, dtype=np.int64)
+        if thresholds.ndim != 2 or thresholds.shape[1] != len(tier_names) + 1:
+            raise ValueError(f"每组应为 {len(tier_names) + 1} 个数字")
+        self.thresholds = thresholds
+        self.scale = scale
+        self.tier_names = tuple(tier_names)
+
+        raw = thresholds[:, :-1]
+        upper = np.clip(raw, 0, scale)
+        # 掷点取第一个不小于它的阈值，某品级的有效上界是它与前面所有阈值的最大值
+        reach = np.maximum.accumulate(upper, axis=1)
+        prev = np.zeros_like(reach)
+        prev[:, 1:] = reach[:, :-1]
+        self.widths = reach - prev
+        self.empty = scale - reach[:, -1]
+
+        flags = np.zeros(len(thresholds), dtype=np.uint8)
+        flags |= np.where((upper < prev).any(axis=1), FLAG_DECREASING, 0).astype(np.uint8)
+        flags |= np.where((raw != upper).any(axis=1), FLAG_CLAMPED, 0).astype(np.uint8)
+        flags |= np.where(self.empty > 0, FLAG_EMPTY, 0).astype(np.uint8)
+        flags |= np.where(thresholds[:, -1] != scale + 1, FLAG_SENTINEL, 0).astype(np.uint8)
+        self.flags = flags
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def percentages(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """[start, stop) 各组的百分比，最后一列为空掉落"""
+        widths = np.column_stack([self.widths[start:stop], self.empty[start:stop]])
+        return widths * (100.0 / self.scale)
+
+    def anomalies(self, mask: int = ~FLAG_EMPTY & 0xFF) -> np.ndarray:
+        """带有 mask 中任一标记的组的下标，默认不把空掉落算作异常"""
+        return np.flatnonzero(self.flags & mask)
+
+    @staticmethod
+    def flag_names(flags: int):
+        return [name for bit, name in FLAG_NAMES.items() if flags & bit]
+
+    @staticmethod
+    def flag_label(flags: int) -> str:
+        return _FLAG_LABELS[flags]
+
+    def summary(self):
+        counts = {name: int(np.count_nonzero(self.flags & bit)) for bit, name in FLAG_NAMES.items()}
+        return {"groups": len(self), "anomalies": len(self.anomalies()), **counts}
+
+    def format_summary(self) -> str:
+        s = self.summary()
+        details = "，".join(f"{name} {s[name]} 组" for name in FLAG_NAMES.values())
+        return f"共 {s['groups']} 组，异常 {s['anomalies']} 组（{details}）"
+
+    def rows(self, start: int = 0, stop: int = None, chunk: int = 10000):
+        """逐组产出 (组号, 阈值列表, 百分比列表, 标记)，按块转换成 Python 对象"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for lo in range(start, stop, chunk):
+            hi = min(lo + chunk, stop)
+            for k, thresholds, pct, flags in zip(range(lo, hi), self.thresholds[lo:hi].tolist(),
+                                                 self.percentages(lo, hi).tolist(),
+                                                 self.flags[lo:hi].tolist()):
+                yield k + 1, thresholds, pct, flags
+
+    def write_csv(self, f, chunk: int = 10000):
+        # 各列都是数字或不含逗号的标记名，不需要 csv 模块的转义；整行一次 % 格式化，比 csv.writer 快一倍
+        size = len(self.tier_names) + 1
+        header = ["组"] + [f"阈值{i}" for i in range(1, size + 1)] + \
+            [f"{name}%" for name in self.tier_names] + ["空掉落%", "异常"]
+        f.write(",".join(header) + "\n")
+        fmt = ",".join(["%d"] * (size + 1) + ["%.4f"] * size + ["%s"]) + "\n"
+        for lo in range(0, len(self), chunk):
+            rows = self.rows(lo, lo + chunk, chunk)
+            f.write("".join(fmt % (group, *thresholds, *pct, _FLAG_LABELS[flags])
+                            for group, thresholds, pct, flags in rows))
+
+    def write_json(self, f):
+        # 每组一行，几十万组时文件仍然可以逐行查看
+        head = {"scale": self.scale, "tiers": list(self.tier_names), "summary": self.summary()}
+        f.write(json.dumps(head, ensure_ascii=False)[:-1] + ', "groups": [')
+        for group, thresholds, pct, flags in self.rows():
+            item = {"group": group, "thresholds": thresholds,
+                    "rates": dict(zip(self.tier_names, (round(p, 6) for p in pct[:-1]))),
+                    "empty": round(pct[-1], 6), "flags": self.flag_names(flags)}
+            f.write(("\n" if group == 1 else ",\n") + json.dumps(item, ensure_ascii=False))
+        f.write("\n]}\n")
+
+_FLAG_LABELS = ["|".join(DropTableAnalysis.flag_names(flags)) for flags in range(256)]
+
+# ---------- 掷点模拟 ----------
+
+# 游戏的掷点方式：在 [ROLL_MIN, ROLL_MAX] 内均匀取整数，取第一个满足条件的阈值。
+# hit="le" 时掷点 <= 阈值即命中，hit="lt" 时掷点 < 阈值即命中（对应 searchsorted 的 left/right）
+ROLL_MIN = 1
+ROLL_MAX = SCALE
+HIT_RULES = {"le": "left", "lt": "right"}
+# 模拟结果除各品级外还有两列：落在哨兵上（空掉落）和越过哨兵（下标越界）
+OUTCOME_EXTRA = ("空掉落", "越过哨兵")
+
+# 每个任务模拟的组数和每组掷点数；随机数种子按任务派生，结果与进程数无关
+SIMULATE_BLOCK = 64
+SIMULATE_ROLLS_PER_TASK = 1 << 24
+# 每批掷点的元素个数（组数 × 每组掷点数），控制内存
+SIMULATE_BATCH = 1 << 22
+
+# 边界标记：按掷点方式精确计算的可命中点数与阈值宽度不符（掷点范围应正好有 满值 个点）
+BOUNDARY_LOW = 1   # 0 一端：第一个品级多或少了点数
+BOUNDARY_HIGH = 2  # 满值一端：后面的品级、空掉落或越过哨兵的点数不符
+BOUNDARY_NAMES = {BOUNDARY_LOW: "0 边界", BOUNDARY_HIGH: "满值边界"}
+
+def exact_counts(thresholds, roll_min: int = ROLL_MIN, roll_max: int = ROLL_MAX,
+                 hit: str = "le") -> np.ndarray:
+    """按掷点方式精确计算每种结果可命中的点数，形状 (组数, 品级数 + 2)"""
+    # 取第一个满足条件的阈值等价于在阈值的前缀最大值上查找，递减的阈值也能正确处理
+    reach = np.maximum.accumulate(np.asarray(thresholds, dtype=np.int64), axis=1)
+    # hit=le 时第 i 种结果为 (reach[i-1], reach[i]]，即整数区间 [reach[i-1] + 1, reach[i] + 1)
+    edges = np.clip(reach + (hit == "le"), roll_min, roll_max + 1)
+    first = np.full((len(edges), 1), roll_min, dtype=np.int64)
+    last = np.full((len(edges), 1), roll_max + 1, dtype=np.int64)
+    return np.diff(np.hstack([first, edges, last]), axis=1)
+
+def _simulate_task(task):
+    """进程池任务：对一批组各掷 rolls 次，返回 (组数, 品级数 + 2) 的命中次数"""
+    thresholds, rolls, roll_min, roll_max, hit, seed, key = task
+    rng = np.random.default_rng([seed, *key])
+    groups, size = thresholds.shape
+    # 阈值截断到 [roll_min - 1, roll_max + 1] 不改变比较结果；再给每组错开 span，
+    # 整批掷点只需在拼接后的一维数组上做一次 searchsorted
+    span = roll_max - roll_min + 3
+    offsets = np.arange(groups, dtype=np.int64) * span
+    reach = np.maximum.accumulate(thresholds, axis=1)
+    flat = (np.clip(reach, roll_min - 1, roll_max + 1) - (roll_min - 1) + offsets[:, None]).ravel()
+    shift = offsets[:, None] - (roll_min - 1)
+    row = np.arange(groups, dtype=np.int64)[:, None]
+    counts = np.zeros(groups * (size + 1), dtype=np.int64)
+    per_batch = max(1, SIMULATE_BATCH // groups)
+    done = 0
+    while done < rolls:
+        n = min(per_batch, rolls - done)
+        values = rng.integers(roll_min, roll_max + 1, size=(groups, n), dtype=np.int64)
+        values += shift
+        # 第 b 组的下标落在 [b * size, b * size + size]，加 b 后正好是该组在 counts 中的位置
+        slots = np.searchsorted(flat, values, side=HIT_RULES[hit])
+        slots += row
+        counts += np.bincount(slots.ravel(), minlength=len(counts))
+        done += n
+    return counts.reshape(groups, size + 1)
+
+def simulate(thresholds, rolls: int = 10_000_000, roll_min: int = ROLL_MIN, roll_max: int = ROLL_MAX,
+             hit: str = "le", seed: int = None, workers: int = 1):
+    """每组各掷 rolls 次，返回 (命中次数数组, 实际使用的种子)
+
+    组按 SIMULATE_BLOCK 分批、掷点按 SIMULATE_ROLLS_PER_TASK 分段作为任务，workers > 1 时放进进程池。
+    """
+    thresholds = np.asarray(thresholds, dtype=np.int64)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    tasks, owners = [], []
+    for start in range(0, len(thresholds), SIMULATE_BLOCK):
+        block = thresholds[start:start + SIMULATE_BLOCK]
+        for part, first in enumerate(range(0, rolls, SIMULATE_ROLLS_PER_TASK)):
+            n = min(SIMULATE_ROLLS_PER_TASK, rolls - first)
+            tasks.append((block, n, roll_min, roll_max, hit, seed, (start, part)))
+            owners.append(start)
+
+    counts = np.zeros((len(thresholds), thresholds.shape[1] + 1), dtype=np.int64)
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_simulate_task, tasks)
+            for start, part in zip(owners, parts):
+                counts[start:start + len(part)] += part
+    else:
+        for start, task in zip(owners, tasks):
+            part = _simulate_task(task)
+            counts[start:start + len(part)] += part
+    return counts, seed
+
+def wilson_interval(counts, n: int, z: float):
+    """命中率的 Wilson 置信区间，命中 0 次或全部命中时对应一端严格为 0 或 1"""
+    p = counts / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    low = np.where(counts == 0, 0.0, np.clip(center - half, 0.0, 1.0))
+    high = np.where(counts == n, 1.0, np.clip(center + half, 0.0, 1.0))
+    return low, high
+
+def sidak_z(confidence: float, tests: int) -> float:
+    """做 tests 次检验、整体置信水平为 confidence 时每次检验的双侧 z 值（Šidák 校正）"""
+    alpha = -math.expm1(math.log(confidence) / max(tests, 1))
+    return -NormalDist().inv_cdf(alpha / 2)
+
+class SimulationResult:
+    """掷点模拟与期望概率的对比
+
+    expected: 按阈值宽度算出的期望概率（即分析结果），exact: 按掷点方式精确计算的概率，
+    rates: 模拟得到的命中率，low/high: 命中率的置信区间。以上形状均为 (组数, 品级数 + 2)，
+    最后两列为空掉落和越过哨兵。confidence 是所有组、所有结果合起来的置信水平，
+    每个区间按组数 × 结果数做 Šidák 校正，配置全部正确时有结果被标为偏差的概率不超过 1 - confidence。
+    deviation 标出期望概率落在置信区间外的结果，boundary 为 BOUNDARY_* 按位组合。
+    """
+
+    def __init__(self, thresholds, counts, rolls: int, roll_min: int = ROLL_MIN,
+                 roll_max: int = ROLL_MAX, hit: str = "le", seed: int = None,
+                 confidence: float = 0.999, scale: int = SCALE, tier_names=TIER_NAMES):
+        analysis = DropTableAnalysis(thresholds, scale, tier_names)
+        self.thresholds = analysis.thresholds
+        self.scale = scale
+        self.tier_names = analysis.tier_names
+        self.outcome_names = self.tier_names + OUTCOME_EXTRA
+        self.counts = counts
+        self.rolls = rolls
+        self.roll_min, self.roll_max, self.hit = roll_min, roll_max, hit
+        self.seed = seed
+        self.confidence = confidence
+        self.elapsed = None
+
+        widths = np.column_stack([analysis.widths, analysis.empty,
+                                  np.zeros(len(analysis), dtype=np.int64)])
+        space = roll_max - roll_min + 1
+        points = exact_counts(self.thresholds, roll_min, roll_max, hit)
+        self.expected = widths / scale
+        self.exact = points / space
+        self.rates = counts / rolls
+        self.z = sidak_z(confidence, counts.size)
+        self.low, self.high = wilson_interval(counts, rolls, self.z)
+        self.deviation = (self.expected < self.low) | (self.expected > self.high)
+
+        # 直接比较点数：掷点范围多一个点（如 [0, 满值]）时只有满值一端不符，不会把 0 一端也算进去
+        mismatch = points != widths
+        boundary = np.where(mismatch[:, 0], BOUNDARY_LOW, 0)
+        boundary |= np.where(mismatch[:, 1:].any(axis=1), BOUNDARY_HIGH, 0)
+        self.boundary = boundary.astype(np.uint8)
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def deviating(self) -> np.ndarray:
+        """有结果偏离期望的组的下标"""
+        return np.flatnonzero(self.deviation.any(axis=1))
+
+    @staticmethod
+    def boundary_names(flags: int):
+        return [name for bit, name in BOUNDARY_NAMES.items() if flags & bit]
+
+    def summary(self):
+        counts = {name: int(np.count_nonzero(self.boundary & bit)) for bit, name in BOUNDARY_NAMES.items()}
+        total = self.rolls * len(self)
+        return {"groups": len(self), "rolls": self.rolls, "total_rolls": total,
+                "roll_range": [self.roll_min, self.roll_max], "hit": self.hit, "seed": self.seed,
+                "confidence": self.confidence, "deviating": len(self.deviating()), **counts,
+                "elapsed": self.elapsed,
+                "rolls_per_sec": total / self.elapsed if self.elapsed else None}
+
+    def format_summary(self) -> str:
+        s = self.summary()
+        details = "，".join(f"{name} {s[name]} 组" for name in BOUNDARY_NAMES.values())
+        text = (f"共 {s['groups']} 组，每组 {s['rolls']} 次掷点（[{self.roll_min}, {self.roll_max}]，"
+                f"掷点 {'<=' if self.hit == 'le' else '<'} 阈值命中，种子 {self.seed}），"
+                f"超出 {self.confidence:.1%} 联合置信区间 {s['deviating']} 组，{details}")
+        if self.elapsed:
+            text += f"\n用时 {self.elapsed:.2f} s（{s['rolls_per_sec'] / 1e6:.1f} M 次/秒）"
+        return text
+
+    def write_csv(self, f):
+        header = ["组", "结果", "期望%", "精确%", "模拟%", "下限%", "上限%", "命中次数", "偏差", "边界"]
+        f.write(",".join(header) + "\n")
+        fmt = "%d,%s,%.6f,%.6f,%.6f,%.6f,%.6f,%d,%s,%s\n"
+        columns = (self.expected, self.exact, self.rates, self.low, self.high)
+        for k in range(len(self)):
+            boundary = "|".join(self.boundary_names(int(self.boundary[k])))
+            values = [(c[k] * 100).tolist() for c in columns]
+            f.write("".join(fmt % (k + 1, name, *(v[i] for v in values), self.counts[k, i],
+                                   "是" if self.deviation[k, i] else "", boundary)
+                            for i, name in enumerate(self.outcome_names)))
+
+    def write_json(self, f):
+        head = {"scale": self.scale, "outcomes": list(self.outcome_names), "summary": self.summary()}
+        f.write(json.dumps(head, ensure_ascii=False)[:-1] + ', "groups": [')
+        for k in range(len(self)):
+            outcomes = {name: {"expected": float(self.expected[k, i]), "exact": float(self.exact[k, i]),
+                               "rate": float(self.rates[k, i]), "low": float(self.low[k, i]),
+                               "high": float(self.high[k, i]), "hits": int(self.counts[k, i]),
+                               "deviation": bool(self.deviation[k, i])}
+                        for i, name in enumerate(self.outcome_names)}
+            item = {"group": k + 1, "thresholds": self.thresholds[k].tolist(),
+                    "boundary": self.boundary_names(int(self.boundary[k])), "outcomes": outcomes}
+            f.write(("\n" if k == 0 else ",\n") + json.dumps(item, ensure_ascii=False))
+        f.write("\n]}\n")
+
+def write_result(result, path: str, fmt: str = None):
+    """按 fmt（csv/json，缺省时看扩展名）写出 DropTableAnalysis 或 SimulationResult"""
+    fmt = fmt or ("json" if path.lower().endswith(".json") else "csv")
+    with open(path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+        if fmt == "json":
+            result.write_json(f)
+        else:
+            result.write_csv(f)
+
+# ---------- 批量生成 ----------
+
+# 各组百分比之和与 100 的允许误差
+RATE_TOLERANCE = 1e-6
+
+def generate_thresholds(rates, scale: int = SCALE) -> np.ndarray:
+    """把 (组数, 品级数) 的百分比一次换算成 (组数, 品级数 + 1) 的累积阈值，最后一列为哨兵 scale + 1
+
+    每组的百分比之和应为 100。各品级先取整数部分，差的点数按最大余数法分给小数部分最大的品级
+    （余数相同时前面的品级优先），各品级宽度之和正好为 scale，不会把误差都压到最后一个品级上。
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    # 先舍到 1e-6 点，免得 29% 这类算成 289999.99999999994 后被当成有很大余数
+    quotas = np.round(rates * (scale / 100.0), 6)
+    widths = np.floor(quotas).astype(np.int64)
+    remainders = quotas - widths
+    deficit = scale - widths.sum(axis=1)
+    order = np.argsort(-remainders, axis=1, kind="stable")
+    bonus = (np.arange(rates.shape[1]) < deficit[:, None]).astype(np.int64)
+    np.put_along_axis(widths, order, np.take_along_axis(widths, order, axis=1) + bonus, axis=1)
+    sentinel = np.full((len(widths), 1), scale + 1, dtype=np.int64)
+    return np.hstack([np.cumsum(widths, axis=1), sentinel])
+
+def check_rates(rates, normalize: bool = False):
+    """检查每组百分比，返回 (可用的百分比数组, 无效组的 {下标: 原因})
+
+    normalize 为 True 时把每组按比例缩放到总和 100，否则总和偏离 100 的组视为无效。
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    totals = rates.sum(axis=1)
+    bad = {}
+    for k in np.flatnonzero(~np.isfinite(rates).all(axis=1)).tolist():
+        bad[k] = "含有无效数字"
+    for k in np.flatnonzero((rates < 0).any(axis=1)).tolist():
+        bad.setdefault(k, "概率不能为负")
+    if normalize:
+        for k in np.flatnonzero(~(totals > 0)).tolist():
+            bad.setdefault(k, "概率之和须大于 0")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = rates * (100.0 / totals)[:, None]
+    else:
+        for k in np.flatnonzero(~(np.abs(totals - 100.0) <= RATE_TOLERANCE)).tolist():
+            bad.setdefault(k, f"概率之和为 {totals[k]:.6f}%，应为 100%")
+    return rates, dict(sorted(bad.items()))
+
+def load_rate_configs(path: str):
+    """读取 CSV（带表头）或 JSON（对象列表）的爆率配置，返回 (名称列表, 品级名, 百分比数组)
+
+    name 列为配置名（可省略），其余各列按出现顺序作为品级，空白或缺少的按 0 计。
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("JSON 配置应为对象的列表")
+            tiers = list(dict.fromkeys(k for row in rows for k in row if k != "name"))
+            names = [str(row.get("name", "")) for row in rows]
+            table = [[row.get(tier, 0) for tier in tiers] for row in rows]
+        else:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            columns = [i for i, h in enumerate(header) if h != "name"]
+            tiers = [header[i] for i in columns]
+            name_col = header.index("name") if "name" in header else None
+            records = [row for row in reader if any(cell.strip() for cell in row)]
+            names = [row[name_col].strip() if name_col is not None and name_col < len(row) else ""
+                     for row in records]
+            table = [[row[i].strip() if i < len(row) and row[i].strip() else 0 for i in columns]
+                     for row in records]
+    if not tiers:
+        raise ValueError("配置中没有品级列")
+    try:
+        rates = np.array(table, dtype=object).reshape(len(table), len(tiers)).astype(np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"配置中有无法识别的数字: {e}") from None
+    return names, tuple(tiers), rates
+
+def write_tables(f, names, thresholds, fmt: str = "txt"):
+    """写出阈值表：txt 为与界面相同的制表符分隔格式（每行一组，可直接交给 analyze/simulate），
+    另有 csv 与 json"""
+    thresholds = np.asarray(thresholds)
+    size = thresholds.shape[1]
+    if fmt == "json":
+        f.write("[\n" + ",\n".join(json.dumps({"name": name, "thresholds": row}, ensure_ascii=False)
+                                    for name, row in zip(names, thresholds.tolist())) + "\n]\n")
+    elif fmt == "csv":
+        f.write(",".join(["name"] + [f"阈值{i}" for i in range(1, size + 1)]) + "\n")
+        line = "%s" + ",%d" * size + "\n"
+        f.write("".join(line % (name.replace(",", " "), *row)
+                        for name, row in zip(names, thresholds.tolist())))
+    else:
+        line = "\t%d" * size + "\n"
+        f.write("".join(line % tuple(row) for row in thresholds.tolist()))
+
+# ---------- 命令行 ----------
+
+def read_groups(path: str, tiers: int = len(TIER_NAMES)) -> np.ndarray:
+    return parse_text(sys.stdin.read(), tiers) if path == "-" else parse_file(path, tiers)
+
+def emit(result, args):
+    if args.output:
+        write_result(result, args.output, args.format)
+    elif args.format == "json":
+        result.write_json(sys.stdout)
+    else:
+        result.write_csv(sys.stdout)
+
+def cmd_analyze(args):
+    analysis = DropTableAnalysis(read_groups(args.input, args.tiers), args.scale,
+                                 default_tier_names(args.tiers))
+    print(analysis.format_summary(), file=sys.stderr)
+    emit(analysis, args)
+    # 有异常的组时返回非零，便于在配置检查脚本中使用
+    return 1 if args.strict and len(analysis.anomalies()) else 0
+
+def cmd_simulate(args):
+    groups = read_groups(args.input, args.tiers)
+    roll_max = args.scale if args.roll_max is None else args.roll_max
+    t0 = time.perf_counter()
+    counts, seed = simulate(groups, args.rolls, args.roll_min, roll_max, args.hit,
+                            args.seed, args.workers)
+    result = SimulationResult(groups, counts, args.rolls, args.roll_min, roll_max, args.hit,
+                              seed, args.confidence, args.scale, default_tier_names(args.tiers))
+    result.elapsed = time.perf_counter() - t0
+    print(result.format_summary(), file=sys.stderr)
+    emit(result, args)
+    # 偏差是统计判断，只作提示；边界不符是按掷点方式精确算出的，才作为失败
+    return 1 if args.strict and result.boundary.any() else 0
+
+def cmd_generate(args):
+    names, tiers, rates = load_rate_configs(args.input)
+    rates, bad = check_rates(rates, args.normalize)
+    keep = np.array([k not in bad for k in range(len(rates))], dtype=bool)
+    thresholds = generate_thresholds(rates[keep], args.scale)
+    kept_names = [name for name, ok in zip(names, keep.tolist()) if ok]
+    fmt = args.format or ("json" if args.output and args.output.lower().endswith(".json") else
+                          "csv" if args.output and args.output.lower().endswith(".csv") else "txt")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8",
+                  newline="") as f:
+            write_tables(f, kept_names, thresholds, fmt)
+    else:
+        write_tables(sys.stdout, kept_names, thresholds, fmt)
+    print(f"品级 {len(tiers)} 个（{'、'.join(tiers)}），生成 {len(thresholds)} 组，"
+          f"无效 {len(bad)} 组", file=sys.stderr)
+    for k, reason in bad.items():
+        print(f"  第 {k + 1} 行 {names[k]}: {reason}", file=sys.stderr)
+    return 1 if bad else 0
+
+def add_output_args(p):
+    p.add_argument("--tiers", type=int, default=len(TIER_NAMES),
+                   help=f"品级数，每组为 品级数 + 1 个数字，默认 {len(TIER_NAMES)}")
+    p.add_argument("--output", help="输出文件，默认输出到标准输出")
+    p.add_argument("--format", choices=["csv", "json"], default=None,
+                   help="输出格式，默认按输出文件扩展名，标准输出时为 csv")
+    p.add_argument("--scale", type=int, default=SCALE, help=f"阈值满值，默认 {SCALE}")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="掉落爆率配置批量处理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("analyze", help="分析爆率数据，输出各品级概率与异常标记")
+    p.add_argument("input", help="爆率数据文件（每组 6 个整数，空白分隔），- 表示标准输入")
+    add_output_args(p)
+    p.add_argument("--strict", action="store_true", help="存在异常组时返回非零")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("simulate", help="按阈值模拟大量掷点，核对实际掉率与期望是否一致")
+    p.add_argument("input", help="爆率数据文件，格式同 analyze，- 表示标准输入")
+    add_output_args(p)
+    p.add_argument("--rolls", type=int, default=10_000_000, help="每组掷点次数，默认 10000000")
+    p.add_argument("--workers", type=int, default=1, help="并行进程数，默认为 1")
+    p.add_argument("--seed", type=int, default=None, help="随机种子，指定后结果可复现")
+    p.add_argument("--roll-min", type=int, default=ROLL_MIN, help=f"掷点最小值（含），默认 {ROLL_MIN}")
+    p.add_argument("--roll-max", type=int, default=None, help="掷点最大值（含），默认与满值相同")
+    p.add_argument("--hit", choices=sorted(HIT_RULES), default="le",
+                   help="le: 掷点 <= 阈值即命中（默认）；lt: 掷点 < 阈值即命中")
+    p.add_argument("--confidence", type=float, default=0.999,
+                   help="所有组、所有结果合起来的置信水平（按组数 × 结果数校正），默认 0.999")
+    p.add_argument("--strict", action="store_true", help="边界不符（精确计算的点数与阈值宽度不符）时返回非零")
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser("generate", help="由百分比配置批量生成阈值表")
+    p.add_argument("input", help="爆率配置，.csv（带表头）或 .json（对象列表），name 列为配置名，其余列为各品级百分比")
+    p.add_argument("--output", help="输出文件，默认输出到标准输出")
+    p.add_argument("--format", choices=["txt", "csv", "json"], default=None,
+                   help="输出格式，默认按输出文件扩展名，其余为 txt（与界面相同的制表符分隔格式）")
+    p.add_argument("--scale", type=int, default=SCALE, help=f"阈值满值，默认 {SCALE}")
+    p.add_argument("--normalize", action="store_true", help="把每组按比例缩放到总和 100%%，而不是视为无效")
+    p.set_defaults(func=cmd_generate)
+    return parser
+
+def main():
+    args = build_arg_parser().parse_args()
+    try:
+        sys.exit(args.func(args))
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""video2webp 转换流程的基准测试：合成视频上的分段吞吐量、内存与输出大小
+
+用 cv2.VideoWriter 按固定规则生成不同分辨率、帧率、时长的合成视频，分两种内容：static（录屏式，
+大段静止，偶尔有光标移动和打字）与 motion（整幅画面都在变化）。对每个视频运行与界面转换线程、
+保存帧线程相同的 convert_clip() / save_frame()，记录各段耗时与吞吐量（帧/秒）、墙钟时间、
+输出字节数和转换额外占用的内存（峰值 RSS 减去开始时的 RSS），输出 JSON 报告。用 --compare 与之前的报告对比，
+确认解码、缩放、编码上的改动确实有效，且输出没有意外变化。
+
+python bench_video2webp.py --grid quick --output bench.json
+python bench_video2webp.py --grid quick --compare bench.json
+python bench_video2webp.py --video clip.mp4 --start 5000 --seconds 10 --workers 4
+
+各段耗时按累加方式测得：解码（只 grab/retrieve 不缩放）、解码 + 缩放（iter_frames）、完整转换，
+缩放和编码的耗时为相邻两次之差；多线程时各段有重叠，只是近似值。每个视频在单独的进程中运行，
+记录开始时的 RSS、峰值 RSS 以及两者之差（rss_delta_mb，即这次转换额外占用的内存）。
+Linux 上读 /proc/self/status 的 VmHWM：ru_maxrss 会跨 fork + exec 保留父进程的峰值，
+spawn 出的子进程读到的是父进程的数字。其他系统退回 ru_maxrss（Windows 上记为 None）。
+"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import PIL
+
+from video2webp_core import (
+    acquire_reader, release_reader, load_index, decode_frames, decode_frames_by_time,
+    iter_frames, convert_clip, save_frame, ConversionStats
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+GRIDS = {
+    "quick": {"sizes": ["640x360", "1280x720"], "source_fps": [30], "seconds": [4],
+              "contents": ["static", "motion"]},
+    "full": {"sizes": ["640x360", "1280x720", "1920x1080"], "source_fps": [24, 60],
+             "seconds": [4, 15], "contents": ["static", "motion"]},
+}
+
+def make_clip(path, fps, seconds, width, height, content="motion"):
+    """生成合成视频
+
+    motion: 斜向滚动的渐变底色加移动色块和帧号，每帧每个像素都在变；
+    static: 固定的色块背景和文字，每秒光标右移一格，每两秒多打一个字，其余时间完全静止。
+    """
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError("无法创建合成视频")
+    scale = height / 720
+    if content == "static":
+        rng = np.random.default_rng(0)
+        base = rng.integers(0, 256, (max(1, height // 8), max(1, width // 8), 3), np.uint8)
+        base = cv2.resize(base, (width, height), interpolation=cv2.INTER_NEAREST)
+        cv2.putText(base, "static text here", (int(100 * scale), int(300 * scale)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 3 * scale, (255, 255, 255), max(1, int(5 * scale)))
+    else:
+        ys, xs = np.mgrid[0:height, 0:width]
+    for k in range(int(fps * seconds)):
+        if content == "static":
+            frame = base.copy()
+            for j in range(int(k // (2 * fps))):
+                cv2.putText(frame, "x", (int((100 + 40 * j) * scale), int(500 * scale)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1.5 * scale, (0, 0, 0), max(1, int(3 * scale)))
+            cx = int((200 + 30 * (k // fps)) * scale)
+            cv2.rectangle(frame, (cx, int(600 * scale)), (cx + int(12 * scale), int(620 * scale)),
+                          (0, 255, 255), -1)
+        elif content == "motion":
+            frame = np.empty((height, width, 3), np.uint8)
+            frame[..., 0] = (xs + 4 * k) % 256
+            frame[..., 1] = (ys + 2 * k) % 256
+            frame[..., 2] = 128
+            x = (8 * k) % max(1, width - 80)
+            frame[height // 3:height // 3 + 80, x:x + 80] = 255
+            cv2.putText(frame, str(k), (20, height - 20), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+        else:
+            raise ValueError(f"未知的内容类型: {content}")
+        writer.write(frame)
+    writer.release()
+
+def _proc_status_mb(field):
+    """读 /proc/self/status 中的内存字段（MB），没有 /proc 时返回 None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb():
+    """本进程到目前为止的峰值 RSS（MB），不支持时返回 None"""
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None or resource is None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def reset_peak_rss():
+    """把本进程的峰值 RSS 重置为当前 RSS（Linux 4.0+），返回当前 RSS（MB）；不支持时返回峰值"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    current = _proc_status_mb("VmRSS")
+    return current if current is not None else peak_rss_mb()
+
+def decode_only(video, start_ms, end_ms, fps, mode):
+    """只解码（按与转换相同的方式 seek 和抽帧），返回 (耗时, 输出帧数)"""
+    reader = acquire_reader(video)
+    try:
+        t0 = time.perf_counter()
+        fps = min(fps, reader.fps)
+        reader.seek(start_ms)
+        if mode == "grab":
+            items = decode_frames_by_time(reader, start_ms, end_ms, reader.fps, fps)
+        else:
+            items = decode_frames(reader, start_ms, end_ms, reader.fps, fps)
+        count = sum(repeat for _, repeat in items)
+        return time.perf_counter() - t0, count
+    finally:
+        release_reader(reader)
+
+def decode_and_scale(video, start_ms, end_ms, fps, scale, mode, workers):
+    """解码并经流水线缩放（不编码），返回 (耗时, 输出帧数)"""
+    reader = acquire_reader(video)
+    try:
+        t0 = time.perf_counter()
+        fps = min(fps, reader.fps)
+        reader.seek(start_ms)
+        frames = iter_frames(reader, reader.fps, start_ms, end_ms, fps, scale,
+                             mode, workers, workers * 2)
+        count = sum(1 for _ in frames)
+        return time.perf_counter() - t0, count
+    finally:
+        release_reader(reader)
+
+def convert(video, start_ms, end_ms, output, fps, scale, mode, workers, dedupe=None):
+    """运行一次完整转换，返回 (耗时, 写入的帧数, 转换器自己统计的各阶段耗时)；
+    不用帧缓存，否则重复运行时测到的是缓存命中"""
+    stats = ConversionStats()
+    t0 = time.perf_counter()
+    written = convert_clip(video, start_ms, end_ms, output, target_fps=fps, scale_percent=scale,
+                           decode_mode=mode, workers=workers, cache=None, dedupe_threshold=dedupe,
+                           stats=stats)
+    return time.perf_counter() - t0, written, stats.as_dict()["times"]
+
+def _fps(frames, seconds):
+    return round(frames / seconds, 1) if seconds > 0 else None
+
+def run_case(case):
+    """运行一个视频的各项测量，返回一条记录；rss_delta_mb 为测量期间峰值比开始时多出的内存"""
+    # 重置峰值后 --no-isolate 时也只统计这一项；重置不了时在单独的进程中运行仍然准确
+    base_rss = reset_peak_rss()
+    video, output = case["video"], case["output"]
+    start_ms, end_ms = case["start_ms"], case["end_ms"]
+    fps, scale, mode, workers = case["fps"], case["scale"], case["mode"], case["workers"]
+
+    t0 = time.perf_counter()
+    load_index(video)
+    index_time = time.perf_counter() - t0
+
+    runs = []
+    for _ in range(case["repeat"]):
+        decode_time, ticks = decode_only(video, start_ms, end_ms, fps, mode)
+        scaled_time, _ = decode_and_scale(video, start_ms, end_ms, fps, scale, mode, workers)
+        convert_time, written, convert_stages = convert(video, start_ms, end_ms, output, fps,
+                                                        scale, mode, workers, case["dedupe"])
+        t0 = time.perf_counter()
+        save_frame(video, (start_ms + end_ms) / 2, output + ".frame.webp",
+                   scale_percent=100, cache=None)
+        frame_time = time.perf_counter() - t0
+        runs.append((decode_time, scaled_time, convert_time, frame_time, convert_stages))
+    # 转换器的分阶段耗时取最快那次转换的
+    convert_stages = min(runs, key=lambda r: r[2])[4]
+    decode_time, scaled_time, convert_time, frame_time = (min(r[k] for r in runs) for k in range(4))
+    scale_time = max(0.0, scaled_time - decode_time)
+    encode_time = max(0.0, convert_time - scaled_time)
+    peak_rss = peak_rss_mb()
+
+    return {
+        "name": case["name"],
+        "size": case.get("size"),
+        "source_fps": case.get("source_fps"),
+        "seconds": (end_ms - start_ms) / 1000,
+        "content": case.get("content"),
+        "ticks": ticks,
+        "frames": written,
+        "wall_time": convert_time,
+        "stages": {"index": index_time, "decode": decode_time, "scale": scale_time,
+                   "encode": encode_time, "frame_save": frame_time},
+        # convert_clip() 内部的分阶段耗时，工作线程中的阶段按各线程累加，可能超过墙钟时间
+        "convert_stages": convert_stages,
+        # 各段按输出帧数折算的吞吐量
+        "fps": {"decode": _fps(ticks, decode_time), "scale": _fps(ticks, scale_time),
+                "encode": _fps(ticks, encode_time), "overall": _fps(ticks, convert_time)},
+        "output_bytes": os.path.getsize(output),
+        "frame_bytes": os.path.getsize(output + ".frame.webp"),
+        "base_rss_mb": base_rss,
+        "peak_rss_mb": peak_rss,
+        "rss_delta_mb": None if peak_rss is None or base_rss is None else peak_rss - base_rss,
+    }
+
+def run_isolated(case):
+    """在新进程中运行 run_case()"""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(run_case, case).result()
+
+def grid_clips(grid):
+    spec = GRIDS[grid]
+    for content in spec["contents"]:
+        for size in spec["sizes"]:
+            for source_fps in spec["source_fps"]:
+                for seconds in spec["seconds"]:
+                    yield {"name": f"{content}_{size}_{source_fps}fps_{seconds}s", "size": size,
+                           "source_fps": source_fps, "seconds": seconds, "content": content}
+
+def run_benchmark(args, tmp, log=sys.stderr):
+    settings = {"fps": args.fps, "scale": args.scale, "mode": args.mode, "workers": args.workers,
+                "dedupe": args.dedupe, "repeat": args.repeat}
+    if args.video:
+        clips = [{"name": os.path.basename(args.video), "video": args.video,
+                  "start_ms": args.start, "end_ms": args.start + args.seconds * 1000}]
+    else:
+        clips = []
+        for clip in grid_clips(args.grid):
+            width, height = map(int, clip["size"].split("x"))
+            clip["video"] = os.path.join(tmp, clip["name"] + ".mp4")
+            make_clip(clip["video"], clip["source_fps"], clip["seconds"], width, height,
+                      clip["content"])
+            clip["start_ms"], clip["end_ms"] = 0, clip["seconds"] * 1000
+            clips.append(clip)
+
+    results = []
+    for clip in clips:
+        case = {**clip, **settings, "output": os.path.join(tmp, "out.webp")}
+        record = run_case(case) if args.no_isolate else run_isolated(case)
+        results.append(record)
+        print(f"{record['name']:<28} {record['wall_time']:8.3f} s  {record['frames']:>5} 帧  "
+              f"解码 {_format(record['fps']['decode'])} 缩放 {_format(record['fps']['scale'])} "
+              f"编码 {_format(record['fps']['encode'])} 帧/秒  "
+              f"{record['output_bytes'] / 1024:8.1f} KB  内存 +{_format(record['rss_delta_mb'])} MB",
+              file=log)
+
+    return {
+        "meta": {
+            "grid": None if args.video else args.grid,
+            "video": args.video,
+            **settings,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "pillow": PIL.__version__,
+            "cpu_count": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+        "summary": {
+            "total_wall_time": sum(r["wall_time"] for r in results),
+            "total_output_bytes": sum(r["output_bytes"] for r in results),
+            "max_peak_rss_mb": max((r["peak_rss_mb"] for r in results
+                                    if r["peak_rss_mb"] is not None), default=None),
+            "max_rss_delta_mb": max((r["rss_delta_mb"] for r in results
+                                     if r["rss_delta_mb"] is not None), default=None),
+            "cases": len(results),
+        },
+    }
+
+def _format(value, spec=".1f"):
+    return "-" if value is None else format(value, spec)
+
+def compare(old, new, bytes_tolerance=0.01):
+    """逐项对比两份报告，打印提速倍数、吞吐量和输出大小的变化，返回输出变化超出容差的项数
+
+    同样的输入和设置下输出应当不变：写入的帧数不同或输出大小变化超过 bytes_tolerance 都算异常。
+    """
+    old_by_name = {r["name"]: r for r in old["results"]}
+    changed = 0
+    differs = [k for k in ("fps", "scale", "mode", "workers", "dedupe")
+               if old["meta"].get(k) != new["meta"].get(k)]
+    if differs:
+        print(f"注意：两份报告的设置不同（{', '.join(differs)}），输出变化是预期的")
+    print(f"{'视频':<28} {'旧耗时':>8} {'新耗时':>8} {'提速':>7} {'解码 帧/秒':>15} {'编码 帧/秒':>15} "
+          f"{'输出 KB':>17} {'内存增量 MB':>15}")
+    for r in new["results"]:
+        o = old_by_name.get(r["name"])
+        if o is None:
+            continue
+        speedup = o["wall_time"] / r["wall_time"] if r["wall_time"] > 0 else math.inf
+        bad = r["frames"] != o["frames"] or \
+            abs(r["output_bytes"] - o["output_bytes"]) > bytes_tolerance * o["output_bytes"]
+        changed += bad
+        print(f"{r['name']:<28} {o['wall_time']:8.3f} {r['wall_time']:8.3f} {speedup:6.2f}x "
+              f"{_format(o['fps']['decode']):>7}->{_format(r['fps']['decode']):<7} "
+              f"{_format(o['fps']['encode']):>7}->{_format(r['fps']['encode']):<7} "
+              f"{o['output_bytes'] / 1024:8.1f}->{r['output_bytes'] / 1024:<8.1f} "
+              # 旧报告没有 rss_delta_mb（其中的 peak_rss_mb 也不可靠），显示为 -
+              f"{_format(o.get('rss_delta_mb'), '.0f'):>7}->{_format(r['rss_delta_mb'], '.0f'):<7}"
+              f"{'  <-- 输出变化' if bad else ''}")
+    print(f"总耗时 {old['summary']['total_wall_time']:.3f} s -> {new['summary']['total_wall_time']:.3f} s，"
+          f"总输出 {old['summary']['total_output_bytes'] / 1024:.1f} KB -> "
+          f"{new['summary']['total_output_bytes'] / 1024:.1f} KB，输出变化 {changed} 项")
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description="video2webp 转换流程基准测试")
+    parser.add_argument("--grid", choices=sorted(GRIDS), default="quick", help="合成视频规格网格")
+    parser.add_argument("--video", help="改用指定视频（只测这一个），不生成合成视频")
+    parser.add_argument("--start", type=float, default=0, help="配合 --video：截取起点（毫秒）")
+    parser.add_argument("--seconds", type=float, default=5, help="配合 --video：截取时长（秒）")
+    parser.add_argument("--fps", type=int, default=20, help="目标帧率")
+    parser.add_argument("--scale", type=int, default=50, help="缩放百分比")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="缩放线程数")
+    parser.add_argument("--mode", choices=["read", "grab"], default="grab", help="解码方式")
+    parser.add_argument("--dedupe", type=int, default=None, help="合并静止画面的阈值，默认不合并")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数，取最短耗时")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="在当前进程中运行（更快；不能重置峰值 RSS 的系统上内存增量是累计的）")
+    parser.add_argument("--output", help="把 JSON 报告写入文件，默认输出到标准输出")
+    parser.add_argument("--compare", metavar="REPORT", help="与之前的 JSON 报告对比，输出变化时返回非零")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 索引缓存放在临时目录，不影响也不借用用户的缓存
+        os.environ["VIDEO2WEBP_CACHE"] = os.path.join(tmp, "index")
+        report = run_benchmark(args, tmp)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        if compare(old, report):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,33 @@
 import sys
 import os
+import time
+import threading
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QSlider, QLabel, QLineEdit, QFileDialog, QMessageBox,
-    QSizePolicy, QSpinBox, QComboBox
+    QSizePolicy, QSpinBox, QComboBox, QTableWidget, QTableWidgetItem,
+    QAbstractItemView, QHeaderView, QCheckBox
 )
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtMultimediaWidgets import QVideoWidget
 from PySide6.QtCore import Qt, QUrl, QSettings, QThread, Signal
-import cv2
-from PIL import Image
 
-# 转换线程（动图）
+from video2webp_core import (
+    convert_clip, save_frame, load_index, frame_cache, FRAME_CACHE_MB, ConversionStats
+)
+
+# 转换线程（动图），转换逻辑见 video2webp_core.convert_clip
+# 两个线程共用 video2webp_core.frame_cache，反复导出同一片段或保存导出过的帧时不必重新解码
+# progress(已完成帧数, 总帧数) 每帧发出一次；timings(ConversionStats) 在 finished 之前发出，
+# 失败或取消时也会发出已完成部分的各阶段耗时
 class WebPConverterThread(QThread):
     finished = Signal(bool, str, str)
+    progress = Signal(int, int)
+    timings = Signal(object)
 
     def __init__(self, video_path, start_ms, end_ms, output_path,
-                 quality=90, target_fps=20, scale_percent=50):
+                 quality=90, target_fps=20, scale_percent=50, decode_mode="grab",
+                 workers=None, queue_depth=None, dedupe_threshold=None, log_timings=False):
         super().__init__()
         self.video_path = video_path
         self.start_ms = start_ms
@@ -25,63 +36,45 @@ class WebPConverterThread(QThread):
         self.quality = quality
         self.target_fps = target_fps
         self.scale_percent = scale_percent
+        self.decode_mode = decode_mode
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.dedupe_threshold = dedupe_threshold
+        self.log_timings = log_timings
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求停止，转换在下一帧处结束并删除未写完的文件"""
+        self.cancel_event.set()
 
     def run(self):
+        stats = ConversionStats()
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            if not cap.isOpened():
-                raise RuntimeError("无法打开视频文件")
-
-            orig_fps = cap.get(cv2.CAP_PROP_FPS)
-            if orig_fps <= 0:
-                orig_fps = 25
-
-            if self.target_fps > orig_fps:
-                self.target_fps = orig_fps
-
-            frame_interval = orig_fps / self.target_fps
-            scale_factor = self.scale_percent / 100.0
-
-            cap.set(cv2.CAP_PROP_POS_MSEC, self.start_ms)
-
-            frames = []
-            current_ms = self.start_ms
-            accum = 0
-            while current_ms < self.end_ms:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                accum += 1
-                if accum >= frame_interval:
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    pil_img = Image.fromarray(frame_rgb)
-                    if scale_factor != 1.0:
-                        new_size = (int(pil_img.width * scale_factor),
-                                    int(pil_img.height * scale_factor))
-                        pil_img = pil_img.resize(new_size, Image.Resampling.LANCZOS)
-                    frames.append(pil_img)
-                    accum -= frame_interval
-                current_ms += 1000 / orig_fps
-
-            cap.release()
-
-            if not frames:
-                raise RuntimeError("未提取到任何帧")
-
-            duration_per_frame = int(1000 / self.target_fps)
-            frames[0].save(
-                self.output_path,
-                format='WEBP',
-                save_all=True,
-                append_images=frames[1:],
-                duration=duration_per_frame,
-                loop=0,
-                quality=self.quality,
-                # method=6 #6压缩最大,但是很慢
-            )
-            self.finished.emit(True, "转换成功", self.output_path)
+            convert_clip(self.video_path, self.start_ms, self.end_ms, self.output_path,
+                         quality=self.quality, target_fps=self.target_fps,
+                         scale_percent=self.scale_percent, decode_mode=self.decode_mode,
+                         workers=self.workers, queue_depth=self.queue_depth,
+                         dedupe_threshold=self.dedupe_threshold, cancel=self.cancel_event,
+                         progress=self.progress.emit, stats=stats)
+            success, message, output_path = True, "转换成功", self.output_path
         except Exception as e:
-            self.finished.emit(False, str(e), "")
+            success, message, output_path = False, str(e), ""
+        if self.log_timings:
+            print(f"{self.output_path}: {message}\n{stats.summary()}", flush=True)
+        self.timings.emit(stats)
+        self.finished.emit(success, message, output_path)
+
+# 打开视频后在后台建立定位索引（已有缓存时只是读取），之后的转换和保存帧直接使用
+class IndexThread(QThread):
+    def __init__(self, video_path):
+        super().__init__()
+        self.video_path = video_path
+
+    def run(self):
+        try:
+            load_index(self.video_path)
+        except Exception:
+            pass  # 索引只用于加速，建立失败时转换照常按时间 seek
 
 # 静态帧保存线程（可选，但为了不阻塞UI也使用线程）
 class FrameSaveThread(QThread):
@@ -94,40 +87,46 @@ class FrameSaveThread(QThread):
         self.output_path = output_path
         self.quality = quality
         self.scale_percent = scale_percent
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求停止，只有还没开始保存时有效（保存一帧很快）"""
+        self.cancel_event.set()
 
     def run(self):
+        if self.cancel_event.is_set():
+            self.finished.emit(False, "已取消", "")
+            return
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            if not cap.isOpened():
-                raise RuntimeError("无法打开视频文件")
-
-            cap.set(cv2.CAP_PROP_POS_MSEC, self.position_ms)
-            ret, frame = cap.read()
-            cap.release()
-
-            if not ret:
-                raise RuntimeError("无法读取当前帧")
-
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(frame_rgb)
-
-            scale_factor = self.scale_percent / 100.0
-            if scale_factor != 1.0:
-                new_size = (int(pil_img.width * scale_factor),
-                            int(pil_img.height * scale_factor))
-                pil_img = pil_img.resize(new_size, Image.Resampling.LANCZOS)
-
-            # 保存为静态WebP（无动画参数）
-            pil_img.save(
-                self.output_path,
-                format='WEBP',
-                quality=self.quality,
-                method=6
-            )
+            save_frame(self.video_path, self.position_ms, self.output_path,
+                       quality=self.quality, scale_percent=self.scale_percent)
             self.finished.emit(True, "帧保存成功", self.output_path)
         except Exception as e:
             self.finished.emit(False, str(e), "")
 
+# 导出队列中的一项：排队时 thread 尚未启动，结束后释放 thread
+class ExportJob:
+    PENDING = "排队中"
+    RUNNING = "进行中"
+    CANCELLING = "取消中"
+    DONE = "完成"
+    FAILED = "失败"
+    CANCELLED = "已取消"
+
+    def __init__(self, description, thread, output_path):
+        self.description = description
+        self.thread = thread
+        self.output_path = output_path
+        self.status = ExportJob.PENDING
+        self.message = ""
+        self.progress = None  # (已完成帧数, 总帧数)
+        self.started = None
+        self.stats = None
+
+    @property
+    def active(self):
+        return self.status in (ExportJob.PENDING, ExportJob.RUNNING, ExportJob.CANCELLING)
+
 class VideoPlayerWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -135,8 +134,8 @@ class VideoPlayerWindow(QMainWindow):
         self.setGeometry(100, 100, 1000, 750)
 
         self.settings = QSettings("YourCompany", "VideoToWebP")
-        self.converter_thread = None
-        self.frame_save_thread = None
+        self.jobs = []  # 导出队列，按加入顺序
+        self.index_threads = []  # 仍在建立索引的线程，连续打开多个视频时可能不止一个
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -232,6 +231,30 @@ class VideoPlayerWindow(QMainWindow):
         self.scale_spin.setSuffix("%")
         settings_layout.addWidget(self.scale_spin)
 
+        settings_layout.addWidget(QLabel("线程数:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(os.cpu_count() or 1)
+        settings_layout.addWidget(self.workers_spin)
+
+        # 相邻帧按 8x8 像素块平均差不超过阈值时视为静止画面，合并为一帧
+        settings_layout.addWidget(QLabel("去重阈值:"))
+        self.dedupe_spin = QSpinBox()
+        self.dedupe_spin.setRange(-1, 255)
+        self.dedupe_spin.setSpecialValueText("关闭")
+        self.dedupe_spin.setValue(-1)  # 默认关闭，输出与逐帧写入相同
+        settings_layout.addWidget(self.dedupe_spin)
+
+        settings_layout.addWidget(QLabel("帧缓存:"))
+        self.cache_spin = QSpinBox()
+        self.cache_spin.setRange(0, 16384)
+        self.cache_spin.setSingleStep(128)
+        self.cache_spin.setSuffix(" MB")
+        self.cache_spin.setValue(int(self.settings.value("frame_cache_mb", FRAME_CACHE_MB)))
+        self.cache_spin.valueChanged.connect(self.set_frame_cache_size)
+        self.set_frame_cache_size(self.cache_spin.value())
+        settings_layout.addWidget(self.cache_spin)
+
         settings_layout.addStretch()
         main_layout.addLayout(settings_layout)
 
@@ -257,6 +280,35 @@ class VideoPlayerWindow(QMainWindow):
         action_layout.addStretch()
         main_layout.addLayout(action_layout)
 
+        # 导出队列：转换和保存帧都先加入队列，最多同时进行“并发任务”个
+        queue_layout = QHBoxLayout()
+        queue_layout.addWidget(QLabel("并发任务:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 16)
+        self.concurrency_spin.setValue(2)
+        self.concurrency_spin.valueChanged.connect(self.start_pending_jobs)
+        queue_layout.addWidget(self.concurrency_spin)
+        self.cancel_jobs_btn = QPushButton("取消所选任务")
+        self.cancel_jobs_btn.clicked.connect(self.cancel_selected_jobs)
+        queue_layout.addWidget(self.cancel_jobs_btn)
+        self.clear_jobs_btn = QPushButton("清除已结束")
+        self.clear_jobs_btn.clicked.connect(self.clear_finished_jobs)
+        queue_layout.addWidget(self.clear_jobs_btn)
+        # 把每次转换各阶段（定位/解码/颜色转换/缩放/编码）的耗时打印到标准输出，便于排查慢的原因
+        self.log_timings_check = QCheckBox("打印耗时")
+        queue_layout.addWidget(self.log_timings_check)
+        queue_layout.addStretch()
+        main_layout.addLayout(queue_layout)
+
+        self.job_table = QTableWidget(0, 3)
+        self.job_table.setHorizontalHeaderLabels(["任务", "输出文件", "状态"])
+        self.job_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.job_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.job_table.verticalHeader().setVisible(False)
+        self.job_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.job_table.setMaximumHeight(150)
+        main_layout.addWidget(self.job_table)
+
         # 连接信号
         self.media_player.positionChanged.connect(self.update_position)
         self.media_player.durationChanged.connect(self.update_duration)
@@ -274,9 +326,32 @@ class VideoPlayerWindow(QMainWindow):
             self.file_label.setText(os.path.basename(file_path))
             self.media_player.setSource(QUrl.fromLocalFile(file_path))
             self.play_pause_btn.setText("播放")
+            thread = IndexThread(file_path)
+            thread.finished.connect(self.on_index_finished)
+            self.index_threads.append(thread)
+            thread.start()
             current_dir = os.path.dirname(file_path)
             self.settings.setValue("last_dir", current_dir)
 
+    def on_index_finished(self):
+        thread = self.sender()
+        # 与导出线程相同，等 run() 真正返回后再释放最后一个引用
+        thread.wait()
+        if thread in self.index_threads:
+            self.index_threads.remove(thread)
+
+    def set_frame_cache_size(self, mb):
+        frame_cache.set_max_bytes(mb * 1024 * 1024)
+        self.settings.setValue("frame_cache_mb", mb)
+
+    def show_cache_stats(self):
+        stats = frame_cache.stats()
+        if stats["hit_rate"] is None:
+            self.status_label.setText("")
+            return
+        self.status_label.setText(f"帧缓存 {stats['bytes'] / 1048576:.0f} MB，"
+                                  f"命中 {stats['hits']}/{stats['hits'] + stats['misses']}")
+
     def select_output_folder(self):
         last_folder = self.settings.value("last_output_folder", "")
         folder = QFileDialog.getExistingDirectory(self, "选择输出文件夹", last_folder)
@@ -309,26 +384,30 @@ class VideoPlayerWindow(QMainWindow):
         self.position_slider.setRange(0, duration)
         self.time_label.setText(self.format_time(0, duration))
 
+    @staticmethod
+    def to_mmss(ms):
+        s = int(ms) // 1000
+        m = s // 60
+        s = s % 60
+        return f"{m:02d}:{s:02d}"
+
     @staticmethod
     def format_time(ms, total_ms):
-        def to_mmss(ms):
-            s = ms // 1000
-            m = s // 60
-            s = s % 60
-            return f"{m:02d}:{s:02d}"
+        to_mmss = VideoPlayerWindow.to_mmss
         return f"{to_mmss(ms)} / {to_mmss(total_ms)}"
 
     def generate_unique_filename(self, folder, prefix, suffix="_frame"):
-        """生成唯一文件名：prefix.webp 或 prefix_frame.webp，若存在则加数字"""
+        """生成唯一文件名：prefix.webp 或 prefix_frame.webp，若存在（或已被队列中的任务占用）则加数字"""
+        taken = {job.output_path for job in self.jobs if job.active}
         base = os.path.join(folder, prefix)
         if suffix:
             base = base + suffix
-        if not os.path.exists(base + ".webp"):
+        if not os.path.exists(base + ".webp") and base + ".webp" not in taken:
             return base + ".webp"
         counter = 1
         while True:
             candidate = f"{base}{counter}.webp"
-            if not os.path.exists(candidate):
+            if not os.path.exists(candidate) and candidate not in taken:
                 return candidate
             counter += 1
 
@@ -369,6 +448,10 @@ class VideoPlayerWindow(QMainWindow):
         quality = self.quality_slider.value()
         target_fps = self.fps_spin.value()
         scale_percent = self.scale_spin.value()
+        workers = self.workers_spin.value()
+        dedupe_threshold = self.dedupe_spin.value()
+        if dedupe_threshold < 0:
+            dedupe_threshold = None
 
         prefix = self.prefix_input.text().strip()
         if not prefix:
@@ -376,32 +459,14 @@ class VideoPlayerWindow(QMainWindow):
         # 动图命名：直接使用前缀，可能加数字
         output_path = self.generate_unique_filename(self.output_folder, prefix, suffix="")
 
-        self.convert_btn.setEnabled(False)
-        self.save_frame_btn.setEnabled(False)
-        self.open_btn.setEnabled(False)
-        self.folder_btn.setEnabled(False)
-        self.status_label.setText("转换中...")
-
-        self.converter_thread = WebPConverterThread(
+        thread = WebPConverterThread(
             self.video_path, start_ms, end_ms, output_path,
-            quality=quality, target_fps=target_fps, scale_percent=scale_percent
+            quality=quality, target_fps=target_fps, scale_percent=scale_percent,
+            workers=workers, dedupe_threshold=dedupe_threshold,
+            log_timings=self.log_timings_check.isChecked()
         )
-        self.converter_thread.finished.connect(self.on_conversion_finished)
-        self.converter_thread.start()
-
-    def on_conversion_finished(self, success, message, output_path):
-        self.convert_btn.setEnabled(True)
-        self.save_frame_btn.setEnabled(True)
-        self.open_btn.setEnabled(True)
-        self.folder_btn.setEnabled(True)
-        self.status_label.setText("")
-
-        if success:
-            QMessageBox.information(self, "成功", f"动图已保存到：{output_path}")
-        else:
-            QMessageBox.critical(self, "错误", f"转换失败：{message}")
-
-        self.converter_thread = None
+        description = f"动图 {self.to_mmss(start_ms)}-{self.to_mmss(end_ms)}"
+        self.enqueue_job(ExportJob(description, thread, output_path))
 
     def save_current_frame(self):
         # 暂停视频
@@ -432,32 +497,128 @@ class VideoPlayerWindow(QMainWindow):
         # 静态帧命名：前缀_frame[数字].webp
         output_path = self.generate_unique_filename(self.output_folder, prefix, suffix="")
 
-        self.convert_btn.setEnabled(False)
-        self.save_frame_btn.setEnabled(False)
-        self.open_btn.setEnabled(False)
-        self.folder_btn.setEnabled(False)
-        self.status_label.setText("保存帧中...")
-
-        self.frame_save_thread = FrameSaveThread(
+        thread = FrameSaveThread(
             self.video_path, position_ms, output_path,
             quality=quality, scale_percent=scale_percent
         )
-        self.frame_save_thread.finished.connect(self.on_frame_save_finished)
-        self.frame_save_thread.start()
-
-    def on_frame_save_finished(self, success, message, output_path):
-        self.convert_btn.setEnabled(True)
-        self.save_frame_btn.setEnabled(True)
-        self.open_btn.setEnabled(True)
-        self.folder_btn.setEnabled(True)
-        self.status_label.setText("")
-
+        self.enqueue_job(ExportJob(f"帧 {self.to_mmss(position_ms)}", thread, output_path))
+
+    # ---------- 导出队列 ----------
+
+    def enqueue_job(self, job):
+        job.thread.finished.connect(self.on_job_finished)
+        if isinstance(job.thread, WebPConverterThread):
+            job.thread.progress.connect(self.on_job_progress)
+            job.thread.timings.connect(self.on_job_timings)
+        self.jobs.append(job)
+        self.job_table.insertRow(self.job_table.rowCount())
+        self.update_job_row(len(self.jobs) - 1)
+        self.start_pending_jobs()
+
+    def start_pending_jobs(self):
+        running = sum(1 for job in self.jobs if job.status in (ExportJob.RUNNING, ExportJob.CANCELLING))
+        for row, job in enumerate(self.jobs):
+            if running >= self.concurrency_spin.value():
+                break
+            if job.status == ExportJob.PENDING:
+                job.status = ExportJob.RUNNING
+                job.started = time.perf_counter()
+                job.thread.start()
+                running += 1
+                self.update_job_row(row)
+        self.update_queue_status()
+
+    def job_for_sender(self):
+        thread = self.sender()
+        return next((row, job) for row, job in enumerate(self.jobs) if job.thread is thread)
+
+    def on_job_progress(self, done, total):
+        row, job = self.job_for_sender()
+        job.progress = (done, total)
+        self.update_job_row(row)
+
+    def on_job_timings(self, stats):
+        row, job = self.job_for_sender()
+        job.stats = stats
+
+    def on_job_finished(self, success, message, output_path):
+        thread = self.sender()
+        row, job = self.job_for_sender()
+        # finished 在 run() 返回前发出，等线程真正结束再释放
+        thread.wait()
+        job.thread = None
         if success:
-            QMessageBox.information(self, "成功", f"帧已保存到：{output_path}")
+            job.status = ExportJob.DONE
+        elif job.status == ExportJob.CANCELLING:
+            job.status = ExportJob.CANCELLED
         else:
-            QMessageBox.critical(self, "错误", f"保存失败：{message}")
-
-        self.frame_save_thread = None
+            job.status = ExportJob.FAILED
+            job.message = message
+        self.update_job_row(row)
+        self.start_pending_jobs()
+
+    def cancel_selected_jobs(self):
+        for index in self.job_table.selectionModel().selectedRows():
+            row = index.row()
+            job = self.jobs[row]
+            if job.status == ExportJob.PENDING:
+                job.status = ExportJob.CANCELLED
+                job.thread = None
+            elif job.status == ExportJob.RUNNING:
+                job.status = ExportJob.CANCELLING
+                job.thread.cancel()
+            self.update_job_row(row)
+        self.update_queue_status()
+
+    def clear_finished_jobs(self):
+        for row in reversed(range(len(self.jobs))):
+            if not self.jobs[row].active:
+                del self.jobs[row]
+                self.job_table.removeRow(row)
+
+    def update_job_row(self, row):
+        job = self.jobs[row]
+        status = f"{job.status}：{job.message}" if job.message else job.status
+        tooltip = status
+        if job.status == ExportJob.RUNNING and job.progress:
+            done, total = job.progress
+            status = f"{job.status} {done}/{total}"
+            if 0 < done < total:
+                remaining = (time.perf_counter() - job.started) / done * (total - done)
+                status += f"，剩余约 {remaining:.0f} s"
+            tooltip = status
+        elif job.stats is not None and not job.active:
+            if job.status == ExportJob.DONE:
+                status = f"{job.status}（{job.stats.total_time:.1f} s）"
+            tooltip = f"{status}\n{job.stats.summary()}"
+        texts = (job.description, job.output_path, status)
+        for column, text in enumerate(texts):
+            item = QTableWidgetItem(text)
+            item.setToolTip(tooltip if column == 2 else text)
+            self.job_table.setItem(row, column, item)
+
+    def update_queue_status(self):
+        running = sum(1 for job in self.jobs if job.status in (ExportJob.RUNNING, ExportJob.CANCELLING))
+        pending = sum(1 for job in self.jobs if job.status == ExportJob.PENDING)
+        if running or pending:
+            self.status_label.setText(f"进行中 {running}，排队 {pending}")
+        else:
+            self.show_cache_stats()
+
+    def closeEvent(self, event):
+        # 退出前停掉所有任务，避免线程仍在运行时被销毁
+        for job in self.jobs:
+            if job.status == ExportJob.PENDING:
+                job.thread = None
+            elif job.thread is not None:
+                job.thread.cancel()
+        for job in self.jobs:
+            if job.thread is not None:
+                job.thread.wait()
+        # 建立索引不能中途停止，等它完成（通常不到一秒）
+        for thread in self.index_threads:
+            thread.wait()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
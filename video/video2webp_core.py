@@ -0,0 +1,1056 @@
+"""video2webp 的转换核心，不依赖 Qt，可在服务器上直接调用或批量运行
+
+convert_clip() 把视频的一段转换为动图 WebP，save_frame() 把某一时刻的帧保存为静态 WebP。
+两者共用进程内的帧缓存 frame_cache，反复导出相同或重叠的片段时不必重新解码。
+命令行从清单（CSV 或 JSON）读取任务，在进程池中批量转换：
+
+python video2webp_core.py jobs.csv --workers 8
+python video2webp_core.py jobs.json --workers 8 --report report.json
+
+清单每行/每项一个任务，字段为 video, start, end（秒）, fps, scale, quality, dedupe, output，
+只有 video 和 end 必填，其余缺省时与界面默认值一致；相对路径相对于清单所在目录。
+"""
+import os
+import sys
+import csv
+import json
+import math
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+from PIL import Image
+
+def frame_schedule(start_ms, end_ms, orig_fps, target_fps):
+    """按源帧逐个产出是否保留该帧：时间窗口内每读一帧累加 1，累计满 orig_fps / target_fps 时保留一帧"""
+    frame_interval = orig_fps / target_fps
+    current_ms = start_ms
+    accum = 0
+    while current_ms < end_ms:
+        accum += 1
+        keep = accum >= frame_interval
+        if keep:
+            accum -= frame_interval
+        yield keep
+        current_ms += 1000 / orig_fps
+
+def output_frame_count(start_ms, end_ms, target_fps):
+    """按时间戳抽帧时的输出帧数：[start_ms, end_ms) 内每 1000 / target_fps 毫秒一帧"""
+    return max(0, math.ceil((end_ms - start_ms) * target_fps / 1000 - 1e-9))
+
+class ConversionStats:
+    """一次转换的统计：各阶段耗时（秒）与帧数，可在多个线程中累加
+
+    seek、dedupe、encode 在调用 convert_clip() 的线程中计时，decode 在解码线程中计时，convert（颜色转换）
+    和 resize 在缩放线程中计时，多线程时为各线程之和，可能超过墙钟时间。wait 为编码器等待下一帧的时间，
+    encode 为保存动图的时间减去 wait 和 dedupe。frames 为已交给编码器的帧数（按输出时刻计），
+    written 为实际写入的帧数（去重后可能更少）。
+    """
+
+    STAGES = ("seek", "decode", "convert", "resize", "dedupe", "wait", "encode")
+
+    def __init__(self):
+        self.times = dict.fromkeys(self.STAGES, 0.0)
+        self.frames = 0
+        self.total_frames = 0
+        self.written = 0
+        self.total_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.times[stage] += seconds
+
+    def as_dict(self):
+        return {"times": dict(self.times), "frames": self.frames, "total_frames": self.total_frames,
+                "written": self.written, "total_time": self.total_time}
+
+    def summary(self):
+        fps = self.frames / self.total_time if self.total_time else 0.0
+        stages = "，".join(f"{stage} {self.times[stage]:.3f} s" for stage in self.STAGES
+                          if self.times[stage])
+        return (f"{self.frames}/{self.total_frames} 帧（写入 {self.written}），"
+                f"用时 {self.total_time:.3f} s（{fps:.1f} 帧/秒）\n  {stages}")
+
+def timed(items, stats, stage):
+    """逐项产出 items，把取每一项所花的时间计入 stats 的 stage 阶段"""
+    items = iter(items)
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            stats.add(stage, time.perf_counter() - t0)
+            return
+        stats.add(stage, time.perf_counter() - t0)
+        yield item
+
+def frame_to_image(frame, scale_factor, stats=None):
+    """OpenCV 的 BGR 帧转为 PIL 图像并按比例缩放，给出 stats 时分别记录 convert、resize 耗时"""
+    t0 = time.perf_counter()
+    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    pil_img = Image.fromarray(frame_rgb)
+    t1 = time.perf_counter()
+    if scale_factor != 1.0:
+        new_size = (int(pil_img.width * scale_factor),
+                    int(pil_img.height * scale_factor))
+        pil_img = pil_img.resize(new_size, Image.Resampling.LANCZOS)
+    if stats is not None:
+        stats.add("convert", t1 - t0)
+        stats.add("resize", time.perf_counter() - t1)
+    return pil_img
+
+_END = object()
+
+def pipeline(items, transform, workers, queue_depth):
+    """三段流水线：items 在解码线程中产出，transform 在线程池中并行执行，结果按输入顺序产出
+
+    items 为 (帧, 重复次数) 的迭代器，产出 (transform(帧), 重复次数)。解码与线程池之间的队列、
+    已提交但尚未被取走的帧各自最多 queue_depth 个，内存占用有上限。cv2 的颜色转换和 Pillow 的缩放
+    都会释放 GIL，用线程即可占满多核。workers <= 1 时在当前线程中顺序执行。
+    调用方提前关闭生成器时，解码线程会在退出前结束，此后才能释放 VideoCapture。
+    """
+    if workers <= 1:
+        for frame, repeat in items:
+            yield transform(frame), repeat
+        return
+
+    raw = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                raw.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decode():
+        # (_END, None) 表示结束，(_END, 异常) 表示解码出错
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put((_END, None))
+        except Exception as e:
+            put((_END, e))
+
+    decoder = threading.Thread(target=decode, daemon=True)
+    decoder.start()
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            frame, value = raw.get()
+            if frame is _END:
+                if value is not None:
+                    raise value
+                break
+            pending.append((pool.submit(transform, frame), value))
+            if len(pending) >= queue_depth:
+                future, repeat = pending.popleft()
+                yield future.result(), repeat
+        while pending:
+            future, repeat = pending.popleft()
+            yield future.result(), repeat
+    finally:
+        stop.set()
+        decoder.join()
+        pool.shutdown(cancel_futures=True)
+
+class LazyFrames:
+    """把帧迭代器包装成按需取帧的多帧图像，作为 append_images 传给 Pillow
+
+    Pillow 保存动图时按 n_frames 逐帧 seek 并立即交给编码器，这里每次 seek 才从迭代器取下一帧，
+    内存中只保留当前帧。迭代器提前结束时重复最后一帧补足（编码器会把相同的帧合并），总时长不变。
+    """
+
+    def __init__(self, frames, n_frames, last_frame):
+        self._frames = frames
+        self._frame = last_frame
+        self._index = -1
+        self.n_frames = n_frames
+
+    def seek(self, index):
+        if index != self._index + 1:
+            raise EOFError("只支持按顺序读取")
+        self._frame = next(self._frames, self._frame)
+        self._index = index
+
+    def tell(self):
+        return self._index
+
+    def __getattr__(self, name):
+        return getattr(self._frame, name)
+
+def save_animated_webp(frames, n_frames, output_path, duration, quality):
+    """边生成边编码动图：frames 为 PIL.Image 迭代器，n_frames 为预期帧数，返回时已写入 output_path"""
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise RuntimeError("未提取到任何帧")
+    # 帧可能来自共用的帧缓存，save() 会改写图像属性，先复制一份
+    first = first.copy()
+    rest = [LazyFrames(frames, n_frames - 1, first)] if n_frames > 1 else []
+    first.save(
+        output_path,
+        format='WEBP',
+        save_all=True,
+        append_images=rest,
+        duration=duration,
+        loop=0,
+        quality=quality,
+        # method=6 #6压缩最大,但是很慢
+    )
+
+# 去重时把两帧之差按 DEDUPE_BLOCK 见方的像素块取平均再比较
+DEDUPE_BLOCK = 8
+
+def frame_difference(a, b):
+    """两帧（同尺寸的数组）的差异：逐像素差的绝对值按块取平均后的最大值（0~255）
+
+    按块平均可以滤掉编码噪声，光标移动、打出一个字这样的小范围变化仍会得到较大的值。
+    """
+    diff = cv2.absdiff(a, b)
+    h, w = diff.shape[:2]
+    blocks = cv2.resize(diff, (max(1, w // DEDUPE_BLOCK), max(1, h // DEDUPE_BLOCK)),
+                        interpolation=cv2.INTER_AREA)
+    return int(blocks.max())
+
+def dedupe_frames(frames, threshold, stats=None):
+    """合并静止画面：frames 为 PIL 图像迭代器，产出 (保留的图像, 合并的帧数)
+
+    与上一个保留帧的差异（见 frame_difference）不超过 threshold 的帧丢弃，计入上一个保留帧的帧数。
+    给出 stats 时比较所花的时间计入 dedupe 阶段。
+    """
+    kept = kept_array = None
+    count = 0
+    for image in frames:
+        # iter_frames 对同一源帧重复产出同一个对象，不必比较
+        if image is kept:
+            count += 1
+            continue
+        t0 = time.perf_counter()
+        array = np.asarray(image)
+        same = kept is not None and frame_difference(array, kept_array) <= threshold
+        if stats is not None:
+            stats.add("dedupe", time.perf_counter() - t0)
+        if kept is not None:
+            if same:
+                count += 1
+                continue
+            yield kept, count
+        kept, kept_array, count = image, array, 1
+    if kept is not None:
+        yield kept, count
+
+class MergedFrames:
+    """把 (图像, 合并的帧数) 迭代器交给 Pillow 边解码边编码，每帧时长为合并的帧数 × frame_duration
+
+    保留下来的帧数事先不知道，而 Pillow 要逐个读取 append_images 的 n_frames。这里给出 max_frames - 1 个
+    单帧占位对象（FrameSlot），轮到某个占位对象时它才根据迭代器是否还有帧决定自己是 1 帧还是 0 帧；
+    各帧时长在取出该帧时追加到 durations，Pillow 编码完第 i 帧才读取 duration[i]。内存中只有当前帧和下一帧。
+    迭代器合计的帧数不足 max_frames 时延长最后一帧补足，总时长不变。
+    """
+
+    def __init__(self, items, max_frames, frame_duration):
+        self._items = iter(items)
+        self._max_frames = max_frames
+        self._frame_duration = frame_duration
+        self._consumed = 0
+        self.durations = []
+        self._next = next(self._items, None)
+        if self._next is None:
+            raise RuntimeError("未提取到任何帧")
+        self.current = self._take()
+
+    def _take(self):
+        image, count = self._next
+        self._next = next(self._items, None)
+        self._consumed += count
+        if self._next is None:
+            count += max(0, self._max_frames - self._consumed)
+        self.durations.append(count * self._frame_duration)
+        return image
+
+    def has_frame(self, i):
+        """第 i 帧（从 0 计）是否存在；Pillow 编码前统计总帧数时尚未读到的帧按存在处理"""
+        return self._next is not None or i < len(self.durations)
+
+    def take(self, i):
+        if i != len(self.durations):
+            raise EOFError("只支持按顺序读取")
+        self.current = self._take()
+
+    def slots(self):
+        return [FrameSlot(self, i) for i in range(1, self._max_frames)]
+
+class FrameSlot:
+    """MergedFrames 中第 i 帧的占位对象，seek(0) 时才从迭代器取帧"""
+
+    def __init__(self, frames, i):
+        self._frames = frames
+        self._i = i
+
+    @property
+    def n_frames(self):
+        return 1 if self._frames.has_frame(self._i) else 0
+
+    def seek(self, index):
+        if index != 0:
+            raise EOFError("只有一帧")
+        self._frames.take(self._i)
+
+    def tell(self):
+        return 0
+
+    def __getattr__(self, name):
+        return getattr(self._frames.current, name)
+
+def save_merged_webp(items, max_frames, output_path, frame_duration, quality):
+    """边生成边编码合并了静止画面的动图：items 为 (PIL.Image, 合并的帧数) 迭代器，
+    合计最多 max_frames 帧，返回实际写入的帧数"""
+    frames = MergedFrames(items, max_frames, frame_duration)
+    # 帧可能来自共用的帧缓存，save() 会改写图像属性，先复制一份
+    first = frames.current.copy()
+    first.save(
+        output_path,
+        format='WEBP',
+        save_all=True,
+        append_images=frames.slots(),
+        duration=frames.durations,
+        loop=0,
+        quality=quality,
+    )
+    return len(frames.durations)
+
+def open_video(video_path):
+    """打开视频，返回 (VideoCapture, 帧率, 时长毫秒)；帧率未知时按 25，时长未知时为 None"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError("无法打开视频文件")
+    orig_fps = cap.get(cv2.CAP_PROP_FPS)
+    if orig_fps <= 0:
+        orig_fps = 25
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    duration_ms = frame_count * 1000 / orig_fps if frame_count > 0 else None
+    return cap, orig_fps, duration_ms
+
+# ---------- 定位索引 ----------
+
+INDEX_VERSION = 1
+# OpenCV 的 FFmpeg 后端 seek 到第 n 帧时，先退到 n - 16 帧之前的关键帧，再向前解码到第 n 帧
+SEEK_BACKOFF_FRAMES = 16
+# 每个进程最多保留的空闲 VideoReader 数
+READER_POOL_SIZE = 4
+
+def index_cache_dir():
+    """索引缓存目录，可用环境变量 VIDEO2WEBP_CACHE 指定"""
+    return os.environ.get("VIDEO2WEBP_CACHE") or \
+        os.path.join(os.path.expanduser("~"), ".cache", "video2webp")
+
+def _file_key(video_path):
+    """(绝对路径, 大小, 修改时间)；不是本地文件（如网络流）时大小和修改时间为 None"""
+    try:
+        st = os.stat(video_path)
+    except OSError:
+        return video_path, None, None
+    return os.path.abspath(video_path), st.st_size, st.st_mtime_ns
+
+class VideoIndex:
+    """视频各帧的时间戳与关键帧位置，用于精确而低成本的定位
+
+    以 CAP_PROP_FORMAT = -1 打开视频只解封装、不解码，扫一遍数据包即可建立，几小时的视频也只需数秒。
+    pts 为按显示顺序排列的各帧时间戳（毫秒），keyframes 为关键帧在其中的下标（升序）。
+    """
+
+    def __init__(self, fps, pts, keyframes):
+        self.fps = fps
+        self.pts = pts
+        self.keyframes = keyframes or [0]
+
+    @classmethod
+    def build(cls, video_path):
+        """扫描视频建立索引；OpenCV 不支持读取原始数据包或关键帧标记时返回 None"""
+        has_key_frame = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+        if has_key_frame is None:
+            return None
+        try:
+            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        except (cv2.error, TypeError):
+            return None
+        try:
+            if not cap.isOpened():
+                return None
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            if fps <= 0:
+                fps = 25
+            packets = []
+            while cap.grab():
+                packets.append((cap.get(cv2.CAP_PROP_POS_MSEC), bool(cap.get(has_key_frame))))
+        finally:
+            cap.release()
+        if not packets:
+            return None
+        # 有 B 帧时数据包按解码顺序排列，时间戳要重新排成显示顺序
+        pts = sorted(ms for ms, _ in packets)
+        keyframes = sorted(bisect_left(pts, ms) for ms, key in packets if key)
+        return cls(fps, pts, keyframes)
+
+    def to_dict(self):
+        # 恒定帧率时不必逐帧保存时间戳
+        step = 1000 / self.fps
+        cfr = all(abs(ms - i * step) < 0.5 for i, ms in enumerate(self.pts))
+        return {"fps": self.fps, "count": len(self.pts),
+                "pts": None if cfr else [round(ms, 3) for ms in self.pts],
+                "keyframes": self.keyframes}
+
+    @classmethod
+    def from_dict(cls, data):
+        pts = data["pts"]
+        if pts is None:
+            pts = [i * 1000 / data["fps"] for i in range(data["count"])]
+        return cls(data["fps"], pts, data["keyframes"])
+
+    @classmethod
+    def load(cls, video_path, cache_dir=None):
+        """读取缓存的索引，缓存不存在或视频的路径、大小、修改时间有变化时重新建立并写入缓存
+
+        缓存写不进去时照常返回索引；无法建立索引（包括不是本地文件）时返回 None。
+        """
+        path, size, mtime_ns = _file_key(video_path)
+        if size is None:
+            return None
+        cache_dir = cache_dir or index_cache_dir()
+        cache_file = os.path.join(cache_dir, hashlib.sha1(path.encode("utf-8")).hexdigest() + ".json")
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+            if (data.get("version"), data.get("path"), data.get("size"), data.get("mtime_ns")) == \
+                    (INDEX_VERSION, path, size, mtime_ns):
+                return cls.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        index = cls.build(video_path)
+        if index is None:
+            return None
+        data = {"version": INDEX_VERSION, "path": path, "size": size, "mtime_ns": mtime_ns,
+                **index.to_dict()}
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+        return index
+
+    def __len__(self):
+        return len(self.pts)
+
+    def frame_at(self, ms):
+        """时间戳离 ms 最近（不早于其前半帧）的帧下标，超出末尾时返回帧数"""
+        return bisect_left(self.pts, ms - 500 / self.fps)
+
+    def keyframe_before(self, i):
+        """第 i 帧之前（含）最近的关键帧下标"""
+        return self.keyframes[max(0, bisect_right(self.keyframes, i) - 1)]
+
+    def seek_cost(self, i):
+        """用 OpenCV seek 到第 i 帧需要解码的帧数"""
+        return i - self.keyframe_before(max(0, i - SEEK_BACKOFF_FRAMES)) + 1
+
+# 进程内按视频缓存的索引，避免每次转换都读一遍缓存文件
+_indexes = {}
+# 每个视频一把锁：同一视频只扫描一次，扫描时不挡住其他视频；_index_lock 只保护 _index_locks
+_index_locks = {}
+_index_lock = threading.Lock()
+
+def load_index(video_path, cache_dir=None):
+    """取视频的 VideoIndex（进程内缓存 + 磁盘缓存），无法建立时返回 None"""
+    key = _file_key(video_path)
+    if key[1] is None:
+        return None
+    with _index_lock:
+        lock = _index_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _indexes:
+            _indexes[key] = VideoIndex.load(video_path, cache_dir)
+        return _indexes[key]
+
+class VideoReader:
+    """记录解码位置的 VideoCapture 封装，接口与 VideoCapture 的 grab/retrieve/read/get 相同
+
+    有索引时 seek() 精确定位到离目标时刻最近的帧；目标在当前位置之后且向前 grab 比 seek 解码的帧更少时
+    （例如同一视频按顺序截取多段），直接向前 grab 而不 seek。
+    """
+
+    def __init__(self, video_path, index=None):
+        self.video_path = video_path
+        self.key = _file_key(video_path)
+        self.cap, self.fps, self.duration_ms = open_video(video_path)
+        self.index = index
+        # 下一次 grab() 得到的帧的下标，没有索引时 seek 之后未知
+        self.position = 0
+
+    def seek(self, ms):
+        if self.index is None:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, ms)
+            self.position = None
+            return
+        self.seek_frame(min(self.index.frame_at(ms), len(self.index) - 1))
+
+    def seek_frame(self, target):
+        """定位到第 target 帧（需要索引），之后 grab() 得到的就是这一帧"""
+        position = self.position
+        if position is not None and position <= target and \
+                target - position <= self.index.seek_cost(target):
+            while self.position < target and self.grab():
+                pass
+            if self.position == target:
+                return
+        self.cap.set(cv2.CAP_PROP_POS_MSEC, self.index.pts[target])
+        self.position = target
+
+    def grab(self):
+        ok = self.cap.grab()
+        if ok and self.position is not None:
+            self.position += 1
+        return ok
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def read(self):
+        ok, frame = self.cap.read()
+        if ok and self.position is not None:
+            self.position += 1
+        return ok, frame
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+_readers = OrderedDict()
+_readers_lock = threading.Lock()
+
+def acquire_reader(video_path, use_index=True):
+    """取一个空闲的 VideoReader（优先复用同一视频上次用过的，保留其解码位置），用完交给 release_reader()"""
+    key = _file_key(video_path)
+    with _readers_lock:
+        idle = _readers.get(key)
+        if idle:
+            reader = idle.pop()
+            if not idle:
+                del _readers[key]
+            if reader.index is not None or not use_index:
+                return reader
+            reader.release()
+    index = load_index(video_path) if use_index else None
+    return VideoReader(video_path, index)
+
+def release_reader(reader):
+    """归还 VideoReader 以便下次复用，超出 READER_POOL_SIZE 时关闭最久未用的"""
+    with _readers_lock:
+        _readers.setdefault(reader.key, []).append(reader)
+        _readers.move_to_end(reader.key)
+        while sum(map(len, _readers.values())) > READER_POOL_SIZE:
+            key, idle = next(iter(_readers.items()))
+            idle.pop(0).release()
+            if not idle:
+                del _readers[key]
+
+# ---------- 帧缓存 ----------
+
+# 默认的帧缓存容量（MB），可用环境变量 VIDEO2WEBP_FRAME_CACHE_MB 指定，0 表示不缓存
+FRAME_CACHE_MB = int(os.environ.get("VIDEO2WEBP_FRAME_CACHE_MB", 512))
+# 清单批量转换默认不缓存：任务排序后基本不重叠，很少命中，每个进程各占 FRAME_CACHE_MB 却白白占内存
+MANIFEST_FRAME_CACHE_MB = 0
+
+class FrameCache:
+    """按总字节数限制容量的 LRU 缓存，存放解码并缩放后的 PIL 图像，可在多个线程间共用
+
+    键由 frame_key() 生成：(视频的路径/大小/修改时间, 帧时间戳, 缩放百分比)，视频文件变化后旧的键自然失效。
+    缓存中的图像会被多个转换共用，只能读取，保存前要先 copy()（Image.save 会改写图像的 encoderinfo）。
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """取出缓存的图像并标记为最近使用，没有时返回 None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, image):
+        size = image.width * image.height * len(image.getbands())
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (image, size)
+            self.bytes += size
+            self._evict()
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            _, (_, size) = self._items.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._items), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else None}
+
+# 进程内共用的帧缓存，界面中的转换线程和保存帧线程都用它
+frame_cache = FrameCache(FRAME_CACHE_MB * 1024 * 1024)
+
+def frame_key(file_key, ms, scale_percent):
+    """帧缓存的键，file_key 为 _file_key() 的返回值，ms 为该帧在索引中的时间戳"""
+    return file_key, round(ms, 3), scale_percent
+
+def plan_frames(index, start_ms, end_ms, orig_fps, target_fps):
+    """按索引算出 decode_frames_by_time() 会取的源帧，返回 [(帧下标, 该帧对应的输出时刻数)]"""
+    step_ms = 1000 / target_fps
+    tolerance = frame_tolerance(orig_fps)
+    pts = index.pts
+    plan = []
+    next_ms = start_ms
+    while next_ms < end_ms:
+        i = bisect_left(pts, next_ms - tolerance)
+        if i >= len(pts) or pts[i] >= end_ms:
+            break
+        repeat = 0
+        while next_ms <= pts[i] + tolerance and next_ms < end_ms:
+            repeat += 1
+            next_ms += step_ms
+        plan.append((i, repeat))
+    return plan
+
+def decode_frames_cached(reader, plan, lookup):
+    """按 plan_frames() 的结果取帧：lookup(帧下标) 命中缓存时直接产出 (图像, 重复次数)，
+    否则定位到该帧解码，产出 ((帧下标, 帧), 重复次数)；连续命中的帧一帧都不解码"""
+    for i, repeat in plan:
+        image = lookup(i)
+        if image is not None:
+            yield image, repeat
+            continue
+        reader.seek_frame(i)
+        if not reader.grab():
+            break
+        ret, frame = reader.retrieve()
+        if not ret:
+            break
+        yield (i, frame), repeat
+
+def frame_tolerance(orig_fps):
+    """时间戳在输出时刻前后半个源帧以内都算命中
+
+    多留 1 微秒，输出时刻恰在两帧正中时总是取前一帧；否则取舍取决于时间戳的最后几位，
+    而索引与解码器算出的时间戳末位可能不同，有缓存和没缓存时会取到不同的帧。
+    """
+    return 500 / orig_fps + 1e-3
+
+def decode_frames(cap, start_ms, end_ms, orig_fps, target_fps):
+    """逐帧读取，产出 (要保留的帧, 1)"""
+    for keep in frame_schedule(start_ms, end_ms, orig_fps, target_fps):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if keep:
+            yield frame, 1
+
+def decode_frames_by_time(cap, start_ms, end_ms, orig_fps, target_fps):
+    """按 CAP_PROP_POS_MSEC 时间戳抽帧，产出 (帧, 该帧对应的输出时刻数)，输出时刻共 output_frame_count() 个
+
+    每个输出时刻取离它最近的源帧，用不到的帧只 grab() 不 retrieve()，省去取出和格式转换。
+    seek 落在起点之前的关键帧时，起点前的帧同样只 grab() 跳过。源帧稀疏（可变帧率）时同一帧
+    会对应多个输出时刻，编码器会把相同的连续帧合并。
+    """
+    step_ms = 1000 / target_fps
+    tolerance = frame_tolerance(orig_fps)
+    next_ms = start_ms
+    last_ms = None
+    while next_ms < end_ms:
+        if not cap.grab():
+            break
+        pos_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+        # 后端不提供可靠的时间戳时，认为 seek 落在起点，之后按帧率推算
+        if last_ms is None and pos_ms <= 0:
+            pos_ms = start_ms
+        elif last_ms is not None and pos_ms <= last_ms:
+            pos_ms = last_ms + 1000 / orig_fps
+        last_ms = pos_ms
+        if pos_ms >= end_ms:
+            break
+        if pos_ms + tolerance < next_ms:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        repeat = 0
+        while next_ms <= pos_ms + tolerance and next_ms < end_ms:
+            repeat += 1
+            next_ms += step_ms
+        yield frame, repeat
+
+def iter_frames(cap, orig_fps, start_ms, end_ms, target_fps, scale_percent,
+                decode_mode="grab", workers=1, queue_depth=2, cache=None, stats=None):
+    """解码并经流水线缩放，按帧序产出要编码的 PIL 图像
+
+    cap 为 VideoCapture 或 VideoReader，需已 seek 到 start_ms。cap 是带索引的 VideoReader、
+    按时间戳抽帧且给出 cache（FrameCache）时，先查缓存，只解码未命中的帧，并把新缩放的帧放入缓存。
+    给出 stats（ConversionStats）时记录 decode、convert、resize 各阶段耗时。
+    """
+    scale_factor = scale_percent / 100.0
+    index = getattr(cap, "index", None)
+    if decode_mode == "grab" and cache is not None and index is not None:
+        file_key = cap.key
+        pts = index.pts
+
+        def lookup(i):
+            return cache.get(frame_key(file_key, pts[i], scale_percent))
+
+        def transform(item):
+            if isinstance(item, Image.Image):
+                return item
+            i, frame = item
+            pil_img = frame_to_image(frame, scale_factor, stats)
+            cache.put(frame_key(file_key, pts[i], scale_percent), pil_img)
+            return pil_img
+
+        plan = plan_frames(index, start_ms, end_ms, orig_fps, target_fps)
+        items = decode_frames_cached(cap, plan, lookup)
+    else:
+        def transform(frame):
+            return frame_to_image(frame, scale_factor, stats)
+
+        if decode_mode == "grab":
+            items = decode_frames_by_time(cap, start_ms, end_ms, orig_fps, target_fps)
+        else:
+            items = decode_frames(cap, start_ms, end_ms, orig_fps, target_fps)
+    if stats is not None:
+        items = timed(items, stats, "decode")
+    images = pipeline(items, transform, workers, queue_depth)
+    try:
+        for pil_img, repeat in images:
+            for _ in range(repeat):
+                yield pil_img
+    finally:
+        images.close()
+
+class ConversionCancelled(Exception):
+    """convert_clip() 的 cancel 被置位，转换中途停止"""
+
+def track_frames(frames, total, cancel=None, progress=None, stats=None):
+    """编码器取帧时的检查点：cancel（threading.Event）已置位时抛出 ConversionCancelled，
+    每交给编码器一帧调用一次 progress(已交出帧数, total)，等待帧的时间计入 stats 的 wait 阶段"""
+    if stats is not None:
+        frames = timed(frames, stats, "wait")
+    done = 0
+    for frame in frames:
+        if cancel is not None and cancel.is_set():
+            raise ConversionCancelled("已取消")
+        done += 1
+        if stats is not None:
+            stats.frames = done
+        if progress is not None:
+            progress(done, total)
+        yield frame
+
+def convert_clip(video_path, start_ms, end_ms, output_path, quality=90, target_fps=20,
+                 scale_percent=50, decode_mode="grab", workers=None, queue_depth=None,
+                 use_index=True, cache=frame_cache, dedupe_threshold=None, cancel=None,
+                 progress=None, stats=None):
+    """把视频 [start_ms, end_ms) 一段转换为动图 WebP，失败时抛出 RuntimeError
+
+    decode_mode 为 "grab" 时按时间戳抽帧，丢弃的帧只 grab() 不取出；"read" 为逐帧 read() 的旧方式。
+    workers 为颜色转换和缩放的线程数（默认为 CPU 核数，1 表示不开线程），queue_depth 为各段之间
+    最多缓冲的帧数（默认为 workers 的两倍）。end_ms 超出视频时长时截到视频末尾。
+    use_index 时借助 VideoIndex 精确定位，并复用同一视频上次打开的 VideoReader。
+    有索引时按时间戳抽帧的结果放入 cache（默认为共用的 frame_cache，None 表示不用缓存），
+    只改质量或帧率重新导出同一片段时命中缓存的帧不再解码和缩放。
+    dedupe_threshold 不为 None 时合并与上一个保留帧差异不超过该值的帧（见 dedupe_frames），
+    静止画面只编码一次，时长合并到保留的帧上。
+    cancel 为 threading.Event，在其他线程中置位后转换在下一帧处停止，删除写了一半的输出文件并抛出
+    ConversionCancelled。progress(已完成帧数, 总帧数) 在编码线程中每帧调用一次。
+    stats（ConversionStats）记录各阶段耗时，出错或取消时也会填写已完成的部分。返回写入的帧数。
+    """
+    start_time = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    queue_depth = queue_depth or workers * 2
+    reader = acquire_reader(video_path, use_index)
+    orig_fps = reader.fps
+    images = None
+    try:
+        if reader.duration_ms is not None:
+            end_ms = min(end_ms, reader.duration_ms)
+        target_fps = min(target_fps, orig_fps)
+        t0 = time.perf_counter()
+        reader.seek(start_ms)
+        if stats is not None:
+            stats.add("seek", time.perf_counter() - t0)
+
+        # 先按抽帧规则算出帧数，再边解码边编码，不必把所有帧留在内存里
+        if decode_mode == "grab":
+            n_frames = output_frame_count(start_ms, end_ms, target_fps)
+        else:
+            n_frames = sum(frame_schedule(start_ms, end_ms, orig_fps, target_fps))
+        if stats is not None:
+            stats.total_frames = n_frames
+        images = iter_frames(reader, orig_fps, start_ms, end_ms, target_fps, scale_percent,
+                             decode_mode, workers, queue_depth, cache, stats)
+        frames = track_frames(images, n_frames, cancel, progress, stats)
+        t0 = time.perf_counter()
+        try:
+            if dedupe_threshold is None:
+                save_animated_webp(frames, n_frames, output_path, int(1000 / target_fps), quality)
+                written = n_frames
+            else:
+                written = save_merged_webp(dedupe_frames(frames, dedupe_threshold, stats), n_frames,
+                                           output_path, int(1000 / target_fps), quality)
+        finally:
+            if stats is not None:
+                stats.add("encode", time.perf_counter() - t0 - stats.times["wait"]
+                          - stats.times["dedupe"])
+        if stats is not None:
+            stats.written = written
+        return written
+    except ConversionCancelled:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        # 先停掉解码线程再归还 VideoReader
+        if images is not None:
+            images.close()
+        release_reader(reader)
+        if stats is not None:
+            stats.total_time = time.perf_counter() - start_time
+
+def save_frame(video_path, position_ms, output_path, quality=90, scale_percent=100,
+               use_index=True, cache=frame_cache):
+    """把 position_ms 处的帧保存为静态 WebP，失败时抛出 RuntimeError
+
+    有索引时先查 cache（None 表示不用缓存），命中则不打开视频。
+    """
+    key = None
+    pil_img = None
+    index = load_index(video_path) if use_index and cache is not None else None
+    if index is not None:
+        i = min(index.frame_at(position_ms), len(index) - 1)
+        key = frame_key(_file_key(video_path), index.pts[i], scale_percent)
+        pil_img = cache.get(key)
+
+    if pil_img is None:
+        reader = acquire_reader(video_path, use_index)
+        try:
+            reader.seek(position_ms)
+            ret, frame = reader.read()
+        finally:
+            release_reader(reader)
+
+        if not ret:
+            raise RuntimeError("无法读取当前帧")
+
+        pil_img = frame_to_image(frame, scale_percent / 100.0)
+        if key is not None:
+            cache.put(key, pil_img)
+    # 缓存中的图像会被共用，save() 会改写图像属性，先复制一份
+    pil_img = pil_img.copy()
+
+    # 保存为静态WebP（无动画参数）
+    pil_img.save(
+        output_path,
+        format='WEBP',
+        quality=quality,
+        method=6
+    )
+
+# ---------- 命令行入口 ----------
+
+# dedupe 为合并静止画面的阈值（见 dedupe_frames），负数表示不合并；有损，默认关闭
+JOB_DEFAULTS = {"start": 0.0, "fps": 20, "scale": 50, "quality": 90, "dedupe": -1}
+
+def load_manifest(path):
+    """读取 CSV（带表头）或 JSON（对象列表）清单，返回任务字典列表"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".json"):
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError("JSON 清单应为任务对象的列表")
+        else:
+            rows = [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                    for row in csv.DictReader(f)]
+    return rows
+
+def normalize_job(row, base_dir, output_dir=None):
+    """补全默认值、转换类型并解析路径；缺少必填字段或取值无效时抛出 ValueError"""
+    try:
+        video = os.path.join(base_dir, row["video"])
+        start = float(row.get("start", JOB_DEFAULTS["start"]))
+        end = float(row["end"])
+        fps = int(row.get("fps", JOB_DEFAULTS["fps"]))
+        scale = int(row.get("scale", JOB_DEFAULTS["scale"]))
+        quality = int(row.get("quality", JOB_DEFAULTS["quality"]))
+        dedupe = int(row.get("dedupe", JOB_DEFAULTS["dedupe"]))
+    except KeyError as e:
+        raise ValueError(f"缺少字段 {e}") from None
+    if end <= start:
+        raise ValueError("end 必须大于 start")
+    if fps <= 0 or not 0 < scale <= 100 or not 1 <= quality <= 100:
+        raise ValueError("fps 须为正数，scale 为 1~100，quality 为 1~100")
+    output = row.get("output")
+    if output:
+        output = os.path.join(output_dir or base_dir, output)
+    else:
+        stem = os.path.splitext(os.path.basename(video))[0]
+        output = os.path.join(output_dir or os.path.dirname(video),
+                              f"{stem}_{int(start * 1000)}-{int(end * 1000)}.webp")
+    return {"video": video, "start_ms": start * 1000, "end_ms": end * 1000, "fps": fps,
+            "scale": scale, "quality": quality, "dedupe": dedupe if dedupe >= 0 else None,
+            "output": output}
+
+def _run_job(args):
+    """进程池任务：转换一个片段，出错时返回 error 字段而不是抛出异常"""
+    job, threads, use_index = args
+    result = {"video": job["video"], "output": job["output"]}
+    stats = ConversionStats()
+    t0 = time.perf_counter()
+    try:
+        result["frames"] = convert_clip(job["video"], job["start_ms"], job["end_ms"], job["output"],
+                                        quality=job["quality"], target_fps=job["fps"],
+                                        scale_percent=job["scale"], workers=threads,
+                                        use_index=use_index, dedupe_threshold=job["dedupe"],
+                                        stats=stats)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.perf_counter() - t0
+    # 各阶段耗时随 --report 一起写出，便于找出慢在哪一步
+    result["stages"] = stats.as_dict()["times"]
+    return result
+
+def set_frame_cache_mb(mb):
+    """设置本进程帧缓存的容量（MB），也用作进程池的 initializer"""
+    frame_cache.set_max_bytes(mb * 1024 * 1024)
+
+def run_manifest(jobs, workers=1, threads=1, use_index=True,
+                 frame_cache_mb=MANIFEST_FRAME_CACHE_MB, log=sys.stderr):
+    """在 workers 个进程中转换所有任务，按完成顺序打印进度，返回按清单顺序排列的结果列表
+
+    任务按 (视频, 起点) 顺序提交，同一进程接连处理同一视频的后续片段时可以复用已打开的 VideoReader，
+    向前 grab 而不必重新 seek。每个进程各有 frame_cache_mb 的帧缓存（默认不缓存），清单中有大量重叠片段时才值得打开。
+    """
+    results = [None] * len(jobs)
+    total = len(jobs)
+    done = 0
+
+    def report(index, result):
+        nonlocal done
+        done += 1
+        results[index] = result
+        status = f"失败: {result['error']}" if "error" in result else \
+            f"{result['frames']} 帧，{result['elapsed']:.2f} s"
+        print(f"[{done}/{total}] {result['output']} {status}", file=log, flush=True)
+
+    order = sorted(range(total), key=lambda k: (jobs[k]["video"], jobs[k]["start_ms"]))
+    if workers <= 1:
+        set_frame_cache_mb(frame_cache_mb)
+        for index in order:
+            report(index, _run_job((jobs[index], threads, use_index)))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_frame_cache_mb,
+                             initargs=(frame_cache_mb,)) as pool:
+        futures = {pool.submit(_run_job, (jobs[index], threads, use_index)): index
+                   for index in order}
+        for future in as_completed(futures):
+            report(futures[future], future.result())
+    return results
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="按清单批量把视频片段转换为动图 WebP（无需 Qt）")
+    parser.add_argument("manifest", help="任务清单，.csv（带表头）或 .json（对象列表）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行进程数，默认为 CPU 核数")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="每个任务内缩放的线程数，默认为 1（进程已经并行）")
+    parser.add_argument("--output-dir", help="输出目录，默认与清单中的相对路径或视频同目录")
+    parser.add_argument("--report", help="把每个任务的结果写入 JSON 文件")
+    parser.add_argument("--no-index", action="store_true",
+                        help="不建立/使用定位索引，直接按时间 seek")
+    parser.add_argument("--frame-cache", type=int, default=MANIFEST_FRAME_CACHE_MB, metavar="MB",
+                        help="每个进程的帧缓存容量（MB），默认 0 即不缓存；片段有大量重叠时可打开")
+    return parser
+
+def main():
+    args = build_arg_parser().parse_args()
+    base_dir = os.path.dirname(os.path.abspath(args.manifest))
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs, invalid = [], []
+    for line_no, row in enumerate(load_manifest(args.manifest), 1):
+        try:
+            jobs.append(normalize_job(row, base_dir, args.output_dir))
+        except (ValueError, TypeError) as e:
+            invalid.append({"job": line_no, "error": f"{type(e).__name__}: {e}"})
+            print(f"第 {line_no} 个任务无效: {e}", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    results = run_manifest(jobs, args.workers, args.threads, not args.no_index, args.frame_cache)
+    failed = [r for r in results if "error" in r]
+    print(f"完成 {len(results) - len(failed)}/{len(results) + len(invalid)} 个，"
+          f"失败 {len(failed)} 个，无效 {len(invalid)} 个，用时 {time.perf_counter() - t0:.1f} s",
+          file=sys.stderr)
+    for r in failed:
+        print(f"  {r['video']} -> {r['output']}: {r['error']}", file=sys.stderr)
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "invalid": invalid}, f, ensure_ascii=False, indent=2)
+    if failed or invalid:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()